@@ -0,0 +1,418 @@
+"""Benchmarks of the client and CLI hot paths against a local fake i-doit server.
+
+Starts ``python -m idoit.fakeserver`` in a subprocess for each inventory size, so the work
+and memory of the server are not attributed to the client, and runs each scenario a number
+of times.  Reports throughput, latency percentiles, and the peak memory allocated by the
+client (measured with ``tracemalloc`` in a separate, untimed run).
+
+Run from the repository root as::
+
+    PYTHONPATH=. python benchmarks/run.py --sizes 1000 10000 --output results.json
+    PYTHONPATH=. python benchmarks/run.py --sizes 1000 10000 --compare results.json
+
+With ``--compare``, the exit status is ``1`` if any scenario's throughput dropped by more
+than ``--threshold`` compared to the earlier results.
+"""
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import logging
+import platform
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+import typing
+
+import attr
+import logzero
+
+from idoit import __version__, codec
+from idoit.__main__ import main as cli_main
+from idoit.api import Client
+from idoit.common import pprint
+
+#: Credentials accepted by the fake server.
+USER, PASSWORD, API_KEY = "admin", "admin", "fake-api-key"
+
+#: The reported latency quantiles.
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+@attr.s(auto_attribs=True, frozen=True)
+class Context:
+    """Parameters of one benchmark run."""
+
+    #: Base URL of the fake server.
+    url: str
+    #: Number of objects in the fake CMDB.
+    size: int
+    #: Number of objects to read in the ``read`` scenario.
+    read_count: int
+    #: Number of parallel requests in the ``read`` scenario.
+    concurrency: int
+
+    def cli(self, *argv: str) -> None:
+        """Run the command line interface, discarding its output."""
+        args = [
+            "--quiet",
+            "--idoit-url",
+            self.url,
+            "--idoit-user",
+            USER,
+            "--idoit-password",
+            PASSWORD,
+            "--idoit-api-key",
+            API_KEY,
+        ]
+        with contextlib.redirect_stdout(io.StringIO()):
+            if cli_main(args + list(argv)):
+                raise RuntimeError("Command failed: %s" % " ".join(argv))
+
+    def client(self) -> Client:
+        return Client(self.url, USER, PASSWORD, API_KEY)
+
+    def read_ids(self) -> typing.List[str]:
+        """Return ids of ``read_count`` objects spread over the inventory."""
+        count = min(self.read_count, self.size)
+        return [str(1 + i * self.size // count) for i in range(count)]
+
+
+class Scenario:
+    """Base class for the benchmark scenarios.
+
+    ``setup()`` and ``teardown()`` are called around the repetitions of ``run()``, which
+    returns the number of items processed.
+    """
+
+    #: Name of the scenario.
+    name = ""
+
+    def __init__(self, ctx: Context):
+        self.ctx = ctx
+
+    def setup(self) -> None:
+        pass
+
+    def run(self) -> int:
+        raise NotImplementedError("Abstract method called.")
+
+    def teardown(self) -> None:
+        pass
+
+
+class Login(Scenario):
+    """Log into and out of the server."""
+
+    name = "login"
+
+    def run(self):
+        with self.ctx.client():
+            pass
+        return 1
+
+
+class ObjectTypes(Scenario):
+    """Discover the object types in a logged in session."""
+
+    name = "object_types"
+
+    def setup(self):
+        self.client = self.ctx.client().__enter__()
+
+    def run(self):
+        self.client._object_types = None
+        return len(self.client.object_types)
+
+    def teardown(self):
+        self.client.__exit__(None, None, None)
+
+
+class Read(Scenario):
+    """``idoit-py read`` of ``read_count`` objects in batches."""
+
+    name = "read"
+    chunk_size = 100
+
+    def run(self):
+        ids = self.ctx.read_ids()
+        self.ctx.cli(
+            "read",
+            "--chunk-size",
+            str(self.chunk_size),
+            "--concurrency",
+            str(self.ctx.concurrency),
+            *ids
+        )
+        return len(ids)
+
+
+class ReadUnbatched(Read):
+    """``idoit-py read`` of ``read_count`` objects with one request per object."""
+
+    name = "read_unbatched"
+    chunk_size = 1
+
+
+class Search(Scenario):
+    """``idoit-py search`` of a term matching many objects."""
+
+    name = "search"
+
+    def run(self):
+        self.ctx.cli("search", "server-0000")
+        return 1
+
+
+class ShellList(Scenario):
+    """``idoit-py shell server list`` rendering all servers."""
+
+    name = "shell_list"
+
+    def run(self):
+        self.ctx.cli("shell", "server", "list")
+        return max(1, self.ctx.size // 6)
+
+
+class ShellShow(Scenario):
+    """``idoit-py shell server show`` rendering one server."""
+
+    name = "shell_show"
+
+    def run(self):
+        self.ctx.cli("shell", "server", "show", "6")
+        return 1
+
+
+class JsonOutput(Scenario):
+    """Pretty-print all objects as JSON as done by the CLI commands."""
+
+    name = "json_output"
+
+    def setup(self):
+        with self.ctx.client() as client:
+            self.objects = list(client.iter_objects())
+
+    def run(self):
+        pprint(self.objects, file=io.StringIO())
+        return len(self.objects)
+
+
+#: The available scenarios by name.
+SCENARIOS: typing.Dict[str, typing.Type[Scenario]] = {
+    cls.name: cls
+    for cls in (Login, ObjectTypes, Read, ReadUnbatched, Search, ShellList, ShellShow, JsonOutput)
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextlib.contextmanager
+def fake_server(size: int, latency: float) -> typing.Iterator[str]:
+    """Run the fake server with ``size`` objects in a subprocess and yield its URL."""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "idoit.fakeserver"]
+        + ["--objects", str(size), "--port", str(port), "--latency", str(latency)]
+        + ["--user", USER, "--password", PASSWORD, "--api-key", API_KEY],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.monotonic() + 10.0
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1.0).close()
+                break
+            except OSError:
+                if proc.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("Fake server did not start")
+                time.sleep(0.05)
+        yield "http://127.0.0.1:%d" % port
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def _quantile(samples: typing.List[float], q: float) -> float:
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def run_scenario(scenario: Scenario, repeat: int) -> typing.Dict[str, typing.Any]:
+    """Run ``scenario`` once for warmup, ``repeat`` times timed, and once traced."""
+    scenario.setup()
+    try:
+        scenario.run()
+        latencies = []
+        items = 0
+        for _ in range(repeat):
+            start = time.perf_counter()
+            items += scenario.run()
+            latencies.append(time.perf_counter() - start)
+        tracemalloc.start()
+        try:
+            scenario.run()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        scenario.teardown()
+    total = sum(latencies)
+    result = {
+        "runs": repeat,
+        "items": items,
+        "seconds": total,
+        "runs_per_second": repeat / total,
+        "items_per_second": items / total,
+        "latency_mean": total / repeat,
+        "latency_max": max(latencies),
+        "peak_memory": peak_memory,
+    }
+    for q in QUANTILES:
+        result["latency_p%d" % int(q * 100)] = _quantile(latencies, q)
+    return result
+
+
+def compare(
+    results: typing.List[typing.Dict[str, typing.Any]],
+    baseline: typing.List[typing.Dict[str, typing.Any]],
+    threshold: float,
+) -> typing.List[str]:
+    """Return descriptions of the scenarios whose throughput regressed by ``threshold``."""
+    before = {(r["scenario"], r["size"]): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = before.get((result["scenario"], result["size"]))
+        if old is None:
+            continue
+        ratio = result["items_per_second"] / old["items_per_second"]
+        if ratio < 1.0 - threshold:
+            regressions.append(
+                "%s at size %d: %.1f -> %.1f items/s (%.0f%%)"
+                % (
+                    result["scenario"],
+                    result["size"],
+                    old["items_per_second"],
+                    result["items_per_second"],
+                    100.0 * (ratio - 1.0),
+                )
+            )
+    return regressions
+
+
+def print_table(results: typing.List[typing.Dict[str, typing.Any]], file=sys.stdout) -> None:
+    header = ("scenario", "size", "items/s", "p50 ms", "p95 ms", "p99 ms", "peak KiB")
+    fmt = "%-14s %9s %12s %10s %10s %10s %10s"
+    print(fmt % header, file=file)
+    for r in results:
+        print(
+            fmt
+            % (
+                r["scenario"],
+                r["size"],
+                "%.1f" % r["items_per_second"],
+                "%.2f" % (1000 * r["latency_p50"]),
+                "%.2f" % (1000 * r["latency_p95"]),
+                "%.2f" % (1000 * r["latency_p99"]),
+                "%.0f" % (r["peak_memory"] / 1024),
+            ),
+            file=file,
+        )
+
+
+def setup_argparse() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="benchmarks/run.py", description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[100, 1000, 10000],
+        help="Numbers of objects in the fake CMDB, default: %(default)s",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        choices=list(SCENARIOS),
+        default=list(SCENARIOS),
+        help="Scenarios to run, default: all",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per scenario, default: %(default)s"
+    )
+    parser.add_argument(
+        "--read-count",
+        type=int,
+        default=100,
+        help="Number of objects to read in the read scenario, default: %(default)s",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Parallel requests in the read scenarios, default: %(default)s",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Simulated server latency in seconds, default: %(default)s",
+    )
+    parser.add_argument("--output", "-o", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Compare throughput to results in this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative throughput drop reported as regression, default: %(default)s",
+    )
+    return parser
+
+
+def main(argv=None):
+    args = setup_argparse().parse_args(argv)
+    logzero.loglevel(logging.WARNING)
+
+    results = []
+    for size in args.sizes:
+        with fake_server(size, args.latency) as url:
+            ctx = Context(
+                url=url, size=size, read_count=args.read_count, concurrency=args.concurrency
+            )
+            for name in args.scenarios:
+                print("Running %s at size %d..." % (name, size), file=sys.stderr)
+                result = run_scenario(SCENARIOS[name](ctx), args.repeat)
+                results.append({"scenario": name, "size": size, **result})
+
+    print_table(results)
+    if args.output:
+        report = {
+            "created": datetime.datetime.now().isoformat(),
+            "idoit_version": __version__,
+            "python_version": platform.python_version(),
+            "json_codec": codec.codec.name,
+            "args": vars(args),
+            "results": results,
+        }
+        with open(args.output, "wt") as outputf:
+            json.dump(report, outputf, indent=2)
+
+    if args.compare:
+        with open(args.compare, "rt") as inputf:
+            regressions = compare(results, json.load(inputf)["results"], args.threshold)
+        for regression in regressions:
+            print("REGRESSION: %s" % regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
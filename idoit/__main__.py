@@ -4,22 +4,30 @@ import argparse
 import logging
 import os
 import sys
+import typing
 
 import logzero
 from logzero import logger
 
 from idoit import __version__
 from .common import run_nocmd
+from .cache import setup_argparse as setup_argparse_cache
+from .cache import run as run_cache
 from .check import setup_argparse as setup_argparse_check
 from .check import run as run_check
 from .constants import setup_argparse as setup_argparse_constants
 from .constants import run as run_constants
+from .metrics import Metrics
+from .recording import Recorder
+from .session_cache import default_cache_dir
 from .shell import setup_argparse as setup_argparse_shell
 from .shell import run as run_shell
 from .read import setup_argparse as setup_argparse_read
 from .read import run as run_read
 from .search import setup_argparse as setup_argparse_search
 from .search import run as run_search
+from .sync import setup_argparse as setup_argparse_sync
+from .sync import run as run_sync
 
 
 def setup_argparse_only():  # pragma: nocover
@@ -57,6 +65,96 @@ def setup_argparse():
         help="i-doit API key, defaults to value of IDOIT_API_KEY environment variable",
     )
 
+    parser.add_argument(
+        "--session-cache",
+        action="store_true",
+        default=bool(os.environ.get("IDOIT_SESSION_CACHE")),
+        help=(
+            "Keep the session open and reuse it in the next invocation, defaults to true if "
+            "IDOIT_SESSION_CACHE environment variable is set"
+        ),
+    )
+    parser.add_argument(
+        "--session-cache-path",
+        default=os.environ.get("IDOIT_SESSION_CACHE_PATH"),
+        help="Path to session cache file, defaults to ~/.cache/idoit-py/sessions.json",
+    )
+
+    parser.add_argument(
+        "--cache",
+        action="store_true",
+        default=bool(os.environ.get("IDOIT_CACHE")),
+        help=(
+            "Cache responses of read-only methods on disk across invocations, defaults to "
+            "true if IDOIT_CACHE environment variable is set"
+        ),
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=os.environ.get("IDOIT_CACHE_DIR") or default_cache_dir(),
+        help="Directory for the on-disk response cache, default: %(default)s",
+    )
+    parser.add_argument(
+        "--mirror-path",
+        default=os.environ.get("IDOIT_MIRROR_PATH"),
+        help=(
+            "Path to the local mirror written by sync and read with --local, defaults to "
+            "mirror.sqlite3 in the cache directory"
+        ),
+    )
+    parser.add_argument(
+        "--sessionless",
+        action="store_true",
+        default=bool(os.environ.get("IDOIT_SESSIONLESS")),
+        help=(
+            "Do not log in and out but authenticate each request with the API key (and user "
+            "and password if given), defaults to true if IDOIT_SESSIONLESS environment "
+            "variable is set"
+        ),
+    )
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        default=1,
+        help=(
+            "Number of sessions to log in for parallel requests, the server processes "
+            "requests of one session one at a time, default: %(default)s"
+        ),
+    )
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        default=None,
+        help="Maximal number of requests per second to send to the server",
+    )
+    parser.add_argument(
+        "--adaptive-concurrency",
+        action="store_true",
+        default=False,
+        help="Adapt the number of parallel requests to the server's latency and error rate",
+    )
+    parser.add_argument(
+        "--metrics-out",
+        default=None,
+        help=(
+            "Write per-method request metrics to this file at exit, as JSON if the name "
+            "ends in .json and in Prometheus text format otherwise"
+        ),
+    )
+    parser.add_argument(
+        "--record",
+        default=None,
+        help="Append all JSON-RPC requests and responses with timings to this NDJSON file",
+    )
+    parser.add_argument(
+        "--replay",
+        default=None,
+        help=(
+            "Answer requests from a file written with --record instead of the server, "
+            "credentials are not needed"
+        ),
+    )
+
     # Add sub parsers for each argument.
     subparsers = parser.add_subparsers(dest="cmd")
 
@@ -67,6 +165,8 @@ def setup_argparse():
     setup_argparse_search(subparsers.add_parser("search", help="Search i-doit."))
     setup_argparse_shell(subparsers.add_parser("shell", help="Item creation."))
     setup_argparse_read(subparsers.add_parser("read", help="Item retrieval."))
+    setup_argparse_cache(subparsers.add_parser("cache", help="Manage on-disk response cache."))
+    setup_argparse_sync(subparsers.add_parser("sync", help="Update the local mirror."))
 
     return parser, subparsers
 
@@ -97,7 +197,18 @@ def main(argv=None):
 
     # Check API key.
     ok = True
-    for key in ("idoit_user", "idoit_password", "idoit_url", "idoit_api_key"):
+    if (
+        args.cmd == "cache"
+        or (args.cmd == "sync" and args.stats)
+        or args.replay
+        or getattr(args, "local", False)
+    ):  # no server
+        required: typing.Tuple[str, ...] = ()
+    elif args.sessionless:  # user and password are optional
+        required = ("idoit_url", "idoit_api_key")
+    else:
+        required = ("idoit_user", "idoit_password", "idoit_url", "idoit_api_key")
+    for key in required:
         if not getattr(args, key):
             logger.error(
                 "i-doit %s not set, either user %s or set %s environment variable",
@@ -117,9 +228,23 @@ def main(argv=None):
         "search": run_search,
         "shell": run_shell,
         "read": run_read,
+        "cache": run_cache,
+        "sync": run_sync,
     }
 
-    res = cmds[args.cmd](args, parser, subparsers.choices[args.cmd] if args.cmd else None)
+    # Collect the metrics of all clients created by the command.
+    args.metrics = Metrics() if args.metrics_out else None
+    # Record the requests of all clients created by the command to one file.
+    args.recorder = Recorder(args.record) if args.record else None
+
+    try:
+        res = cmds[args.cmd](args, parser, subparsers.choices[args.cmd] if args.cmd else None)
+    finally:
+        if args.recorder is not None:
+            args.recorder.close()
+        if args.metrics is not None:
+            logger.info("Writing request metrics to %s", args.metrics_out)
+            args.metrics.dump(args.metrics_out)
     if not res:
         logger.info("All done. Have a nice day!")
     else:  # pragma: nocover
@@ -0,0 +1,141 @@
+"""Asyncio variant of the API wrapper code.
+
+Requires the optional dependency ``aiohttp`` (``pip install idoit-py[async]``).
+"""
+
+import asyncio
+import typing
+
+import aiohttp
+from logzero import logger
+
+from . import codec
+from .api import BaseClient, object_types_from_result
+
+
+class AsyncClient(BaseClient):
+    """The asyncio counterpart of ``idoit.api.Client``.
+
+    Use as an asynchronous context manager to ensure sessions are closed.  All queries share
+    one pool of keep-alive connections and at most ``concurrency`` requests are in flight at
+    any time, so many queries can be fanned out with ``asyncio.gather()``.
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        user: str,
+        password: str,
+        api_key: str,
+        *,
+        concurrency: int = 10,
+        limit: int = 100,
+        limit_per_host: int = 0,
+        keep_alive: bool = True
+    ):
+        """The asyncio API client class.
+
+        ``concurrency`` is the maximal number of requests in flight, ``limit`` and
+        ``limit_per_host`` bound the number of pooled connections in total and per host
+        (``0`` for no limit).  Set ``keep_alive`` to ``False`` to close connections after
+        each request.
+        """
+        super().__init__(server_url, user, password, api_key)
+        self.concurrency = concurrency
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keep_alive = keep_alive
+        #: The ``aiohttp`` session owning the connection pool, created on demand.
+        self._http: typing.Optional[aiohttp.ClientSession] = None
+        #: Semaphore limiting the requests in flight, created on demand in the running loop.
+        self._semaphore: typing.Optional[asyncio.Semaphore] = None
+
+    def _http_session(self) -> aiohttp.ClientSession:
+        """Return the HTTP session with the connection pool, create if necessary."""
+        if self._http is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                force_close=not self.keep_alive,
+            )
+            self._http = aiohttp.ClientSession(
+                connector=connector, headers={"Content-Type": "application/json"}
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._http
+
+    async def close(self):
+        """Close all pooled HTTP connections."""
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+            self._semaphore = None
+
+    async def login(self):
+        logger.info("Logging into i-doit %s as %s", self.server_url, self.user)
+        response = await self._send_request(
+            "idoit.login", extra_headers=self._login_headers(), is_login=True
+        )
+        self.session_id = response["result"]["session-id"]
+        logger.info("Login successful")
+
+    async def get_object_types(self) -> typing.Dict[int, str]:
+        """Return mapping from object type number to object type name.
+
+        The object types are fetched from the server on the first call only.
+        """
+        if self._object_types is None:
+            logger.debug("Fetching object types from server...")
+            result = (await self.query("cmdb.object_types.read"))["result"]
+            self._object_types = object_types_from_result(result)
+            logger.debug("Fetched object types from server: %d", len(self._object_types))
+        return self._object_types
+
+    async def logout(self):
+        logger.info("Logging out of i-doit %s", self.server_url)
+        await self._send_request("idoit.logout")
+        self.session_id = None
+        logger.info("Logout successful")
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, *args, **kwargs):
+        try:
+            await self.logout()
+        finally:
+            await self.close()
+        return False
+
+    async def _post(self, payload: typing.Any, headers: typing.Dict[str, typing.Any]) -> typing.Any:
+        http = self._http_session()
+        semaphore = self._semaphore
+        assert semaphore is not None  # created together with the HTTP session
+        logger.debug("Sending request, payload = %s", payload)
+        async with semaphore:
+            data = codec.dumps_bytes(payload)
+            async with http.post(self.jsonrpc_url, data=data, headers=headers) as res:
+                res.raise_for_status()
+                return codec.loads(await res.read())
+
+    async def _send_request(
+        self,
+        method: str,
+        *,
+        params: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        extra_headers: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        is_login: bool = False
+    ) -> typing.Dict[str, typing.Any]:
+        if not is_login and not self.session_id:
+            raise Exception("Must login first!")
+        return await self._post(
+            self._make_payload(method, params), self._make_headers(extra_headers)
+        )
+
+    async def query_version(self):
+        """Return server version."""
+        return (await self._send_request("idoit.version"))["result"]["version"]
+
+    async def query(self, command, params=None):
+        return await self._send_request(command, params=params or {})
@@ -1,20 +1,60 @@
 """The API wrapper code."""
 
+from concurrent.futures import ThreadPoolExecutor
+import collections
+import contextlib
+from itertools import islice
+import queue
+import random
 import re
+import threading
+import time
 import typing
 
 from logzero import logger
 import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from urllib3.exceptions import MaxRetryError, NewConnectionError
 
+from . import codec
+from .caching import BaseCache, is_read_method
+from .metrics import Metrics
+from .recording import Recorder
+from .session_cache import SessionCache
+from .streaming import ResponseError, iter_json_array
+from .throttle import AdaptiveConcurrencyLimiter, TokenBucket
 
-class Client:
-    """The class working as the client.
+#: JSON-RPC error code used by i-doit when authentication fails, e.g., on expired sessions.
+AUTH_ERROR_CODE = -32604
+
+#: HTTP status codes considered transient, e.g., from a reverse proxy.
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+
+
+def _not_connected(error: Exception) -> bool:
+    """Return whether the request failing with ``error`` never reached the server."""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = error.args[0] if error.args else None
+    if isinstance(reason, MaxRetryError):
+        reason = reason.reason
+    return isinstance(reason, NewConnectionError)  # e.g., connection refused
+
+
+def object_types_from_result(
+    result: typing.Iterable[typing.Dict[str, typing.Any]],
+) -> typing.Dict[int, str]:
+    """Build object type mapping from the result of ``cmdb.object_types.read``."""
+    return {
+        int(obj_type["id"]): re.sub("[^a-zA-Z0-9]", "-", obj_type["title"].lower())
+        for obj_type in result
+    }
 
-    Use as a context manager to ensure sessions are closed.
-    """
+
+class BaseClient:
+    """Code shared between the blocking ``Client`` and the asyncio ``AsyncClient``."""
 
     def __init__(self, server_url: str, user: str, password: str, api_key: str):
-        """The API client class."""
         while server_url.endswith("/"):
             server_url = server_url[:-1]
         self.server_url = server_url
@@ -24,44 +64,452 @@ class Client:
         self.user = user
         self.password = password
         self._req_no = 0
-        #: Mapping from object type number to object type name, inferred from objects after login.
-        self.object_types: typing.Dict[int, str] = {}
+        self._req_no_lock = threading.Lock()
+        #: Mapping from object type number to object type name, fetched on first access.
+        self._object_types: typing.Optional[typing.Dict[int, str]] = None
 
     def _next_req_no(self):
-        self._req_no += 1
-        return self._req_no
+        with self._req_no_lock:
+            self._req_no += 1
+            return self._req_no
 
-    def login(self):
-        logger.info("Logging into i-doit %s as %s", self.server_url, self.user)
+    def _login_headers(self) -> typing.Dict[str, str]:
+        return {"X-RPC-Auth-Username": self.user, "X-RPC-Auth-Password": self.password}
+
+    def _make_headers(
+        self, extra_headers: typing.Optional[typing.Dict[str, typing.Any]] = None
+    ) -> typing.Dict[str, typing.Any]:
+        headers = {**(extra_headers or {})}  # copy
+        if self.session_id:
+            headers["X-RPC-Auth-Session"] = self.session_id
+        return headers
+
+    def _make_payload(
+        self, method: str, params: typing.Optional[typing.Dict[str, typing.Any]] = None
+    ) -> typing.Dict[str, typing.Any]:
+        params = {**(params or {}), "apikey": self.api_key}
+        return {"method": method, "params": params, "jsonrpc": "2.0", "id": self._next_req_no()}
+
+    def _is_auth_error(self, response: typing.Any) -> bool:
+        """Return whether ``response`` (or one in a batch) signals an authentication error."""
+        if isinstance(response, list):
+            return any(self._is_auth_error(r) for r in response)
+        return (response.get("error") or {}).get("code") == AUTH_ERROR_CODE
+
+
+class Client(BaseClient):
+    """The class working as the client.
+
+    Use as a context manager to ensure sessions are closed.  The client keeps a pool of
+    keep-alive HTTP connections to the server for the lifetime of the ``with`` block so
+    subsequent queries do not pay for a new TCP/TLS handshake.
+
+    Once logged in, a client can be shared by many threads, e.g., the workers of a
+    ``concurrent.futures.ThreadPoolExecutor``: request ids are allocated atomically, the
+    parameters passed by the caller are never modified, each thread uses its own
+    ``requests.Session`` on top of the shared (thread-safe) connection pool, and re-logins
+    are serialized.  Choose ``pool_maxsize`` to be at least the number of threads to keep
+    one connection per thread alive.  Logging in and out is not thread-safe and should be
+    done by the owning thread (e.g., in the ``with`` statement).
+    """
+
+    def __init__(
+        self,
+        server_url: str,
+        user: str,
+        password: str,
+        api_key: str,
+        *,
+        pool_connections: int = 1,
+        pool_maxsize: int = 10,
+        pool_block: bool = False,
+        keep_alive: bool = True,
+        session_cache: typing.Optional[SessionCache] = None,
+        sessions: int = 1,
+        sessionless: bool = False,
+        cache: typing.Optional[BaseCache] = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        backoff_max: float = 30.0,
+        relogin: bool = True,
+        rate_limiter: typing.Optional[TokenBucket] = None,
+        concurrency_limiter: typing.Optional[AdaptiveConcurrencyLimiter] = None,
+        metrics: typing.Optional[Metrics] = None,
+        recorder: typing.Optional[Recorder] = None,
+        adapter: typing.Optional[BaseAdapter] = None
+    ):
+        """The API client class.
+
+        ``pool_connections`` is the number of per-host connection pools to cache,
+        ``pool_maxsize`` the maximal number of connections kept open per host, and
+        ``pool_block`` controls whether to block when all connections of a host are in use
+        (rather than opening a throw-away connection).  Set ``keep_alive`` to ``False`` to
+        close connections after each request.
+
+        When a ``session_cache`` is given, the session is not closed on leaving the ``with``
+        block but stored in the cache and reused by the next client for the same server and
+        user.
+
+        i-doit serializes all requests of one PHP session on the server side.  Set
+        ``sessions`` to a value greater than one to log in that many sessions and distribute
+        concurrent queries (e.g., from ``map()``) over them; each session serves one request
+        at a time.  The additional sessions are logged out again on leaving the ``with``
+        block.
+
+        With ``sessionless``, the client does not log in or out at all and authenticates
+        each request by the API key alone, saving two round trips and avoiding the session
+        lock on the server.  If ``user`` and ``password`` are given, they are sent along
+        with each request so the server acts as that user.  ``session_cache`` and
+        ``sessions`` have no effect in this mode.
+
+        If a ``cache`` is given, ``query()`` answers calls to read-only methods from the
+        cache if possible, and calls to writing methods invalidate the cache.
+
+        Requests to read-only methods failing with a connection error or a transient HTTP
+        status (see ``RETRY_STATUS_CODES``) are repeated up to ``retries`` times, waiting a
+        random time of up to ``backoff_factor * 2 ** attempt`` (at most ``backoff_max``)
+        seconds in between.  Requests that could not connect at all (refused or timed out
+        connections) are retried for all methods.  With ``relogin``, the client logs in
+        again when the server rejects the session, e.g., because it expired, and repeats the
+        request.
+
+        A ``rate_limiter`` bounds the number of requests per second, and a
+        ``concurrency_limiter`` the number of requests in flight, adapting it to the latency
+        and error rate of the server.  Both can be shared between clients.
+
+        Counts, latencies, and payload sizes of the requests are recorded per method in
+        ``metrics`` (a new ``Metrics`` object if not given), see ``stats()``.
+
+        A ``recorder`` writes all requests and responses to a file, which a
+        ``ReplayAdapter`` given as ``adapter`` can serve back without a server (see
+        ``idoit.recording``).  By default, an ``HTTPAdapter`` with the pool settings above
+        is used.
+        """
+        super().__init__(server_url, user, password, api_key)
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.session_cache = session_cache
+        self.sessions = sessions
+        self.sessionless = sessionless
+        self.cache = cache
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self.relogin = relogin
+        self.rate_limiter = rate_limiter
+        self.concurrency_limiter = concurrency_limiter
+        self.metrics = Metrics() if metrics is None else metrics
+        self.recorder = recorder
+        #: The transport adapter given by the user, if any.
+        self.adapter = adapter
+        #: Pool of idle session ids when using more than one session.
+        self._session_pool: typing.Optional[queue.Queue] = None
+        #: Lock for (re-)logging in and fetching the object types.
+        self._lock = threading.RLock()
+        #: The adapter owning the connection pool shared by all threads, created on demand.
+        self._adapter: typing.Optional[BaseAdapter] = None
+        #: Thread-local storage for the per-thread ``requests`` session, which is released
+        #: with its thread, e.g., the workers of ``map()``.
+        self._local = threading.local()
+
+    def _http_session(self) -> requests.Session:
+        """Return the calling thread's HTTP session, create if necessary.
+
+        ``requests.Session`` is not thread-safe, so each thread gets its own session; all of
+        them share the same adapter with the connection pool.
+        """
+        session = getattr(self._local, "session", None)
+        if session is None:
+            with self._lock:
+                if self._adapter is None:
+                    self._adapter = self.adapter or HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        pool_block=self.pool_block,
+                    )
+                session = requests.Session()
+                session.headers["Content-Type"] = "application/json"
+                session.mount("http://", self._adapter)
+                session.mount("https://", self._adapter)
+                if not self.keep_alive:
+                    session.headers["Connection"] = "close"
+                self._local.session = session
+        return session
+
+    def close(self):
+        """Close all pooled HTTP connections."""
+        with self._lock:
+            if self._adapter is not None:
+                self._adapter.close()
+            self._local = threading.local()
+            self._adapter = None
+
+    def _login_session(self) -> str:
+        """Log in and return the new session id."""
         response = self._send_request(
             "idoit.login",
-            extra_headers={"X-RPC-Auth-Username": self.user, "X-RPC-Auth-Password": self.password},
+            extra_headers=self._login_headers(),
             is_login=True,
         )
-        self.session_id = response["result"]["session-id"]
+        return response["result"]["session-id"]
+
+    def _logout_session(self, session_id: str) -> None:
+        """Log out the session with the given id."""
+        self._post(self._make_payload("idoit.logout"), {"X-RPC-Auth-Session": session_id})
+
+    def login(self):
+        logger.info("Logging into i-doit %s as %s", self.server_url, self.user)
+        self.session_id = self._login_session()
         logger.info("Login successful")
-        logger.debug("Fetching object types from server...")
-        self.object_types = {
-            obj["type"]: re.sub("[^a-zA-Z0-9]", "-", obj["type_title"].lower())
-            for obj in self.query("cmdb.objects.read")["result"]
-        }
-        logger.debug("Fetched object types from server: %d", len(self.object_types))
+        if self.session_cache:
+            self.session_cache.put(self.server_url, self.user, self.session_id)
+
+    @property
+    def object_types(self) -> typing.Dict[int, str]:
+        """Mapping from object type number to object type name.
+
+        The object types are fetched from the server's type registry on first access only,
+        so commands that do not need them do not pay for the query.
+        """
+        with self._lock:
+            if self._object_types is None:
+                logger.debug("Fetching object types from server...")
+                self._object_types = object_types_from_result(
+                    self.query("cmdb.object_types.read")["result"]
+                )
+                logger.debug("Fetched object types from server: %d", len(self._object_types))
+        return self._object_types
 
     def logout(self):
         logger.info("Logging out of i-doit %s", self.server_url)
-        self._send_request("idoit.logout")
+        self._logout_session(self.session_id)
         self.session_id = None
+        if self.session_cache:
+            self.session_cache.remove(self.server_url, self.user)
         logger.info("Logout successful")
         pass
 
+    def open_session_pool(self):
+        """Log in the additional sessions for distributing concurrent queries."""
+        if self.sessionless or self.sessions <= 1 or self._session_pool is not None:
+            return
+        logger.info("Logging in %d additional sessions", self.sessions - 1)
+        self._session_pool = queue.Queue()
+        self._session_pool.put(self.session_id)
+        for _ in range(self.sessions - 1):
+            self._session_pool.put(self._login_session())
+
+    def close_session_pool(self):
+        """Log out the additional sessions, must not be called while queries are running."""
+        if self._session_pool is None:
+            return
+        pool, self._session_pool = self._session_pool, None
+        logger.info("Logging out %d additional sessions", pool.qsize() - 1)
+        while not pool.empty():
+            session_id = pool.get()
+            if session_id != self.session_id:
+                self._logout_session(session_id)
+
     def __enter__(self):
-        self.login()
+        if self.sessionless:
+            logger.debug("Using sessionless requests to %s", self.server_url)
+        else:
+            if self.session_cache:
+                self.session_id = self.session_cache.get(self.server_url, self.user)
+                if self.session_id:
+                    logger.debug("Reusing cached session for %s", self.server_url)
+            if not self.session_id:
+                self.login()
+            self.open_session_pool()
+        if self.cache is not None:
+            self.cache.bind(self)
         return self
 
     def __exit__(self, *args, **kwargs):
-        self.logout()
+        try:
+            self.close_session_pool()
+            if not self.session_cache and not self.sessionless:
+                self.logout()
+        finally:
+            self.close()
+            if self.cache is not None:
+                self.cache.close()
         return False
 
+    def _check_logged_in(self):
+        if not self.session_id and not self.sessionless:
+            raise Exception("Must login first!")
+
+    def _make_headers(
+        self, extra_headers: typing.Optional[typing.Dict[str, typing.Any]] = None
+    ) -> typing.Dict[str, typing.Any]:
+        headers = super()._make_headers(extra_headers)
+        if self.sessionless and self.user and self.password:
+            headers.update(self._login_headers())
+        return headers
+
+    @contextlib.contextmanager
+    def _checkout_headers(
+        self, extra_headers: typing.Optional[typing.Dict[str, typing.Any]] = None
+    ) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """Return request headers, using an idle session from the pool if any.
+
+        The session is returned to the pool on exit (or its replacement if it has been
+        replaced in the headers by ``_relogin()``).
+        """
+        headers = self._make_headers(extra_headers)
+        pool = self._session_pool
+        if pool is None:
+            yield headers
+        else:
+            headers["X-RPC-Auth-Session"] = pool.get()
+            try:
+                yield headers
+            finally:
+                pool.put(headers["X-RPC-Auth-Session"])
+
+    def _relogin(self, response: typing.Any, headers: typing.Dict[str, typing.Any]) -> bool:
+        """Log in again if ``response`` signals an invalid session.
+
+        ``headers`` are the headers the request was sent with.  If another thread already
+        logged in again in the meantime, only the new session id is put into ``headers``.
+        Returns whether the request should be sent again.
+        """
+        if not self.relogin or self.sessionless or not self._is_auth_error(response):
+            return False
+        with self._lock:
+            if self.session_id == headers.get("X-RPC-Auth-Session"):
+                logger.info("Session was rejected by server, logging in again")
+                if self.session_cache:
+                    self.session_cache.remove(self.server_url, self.user)
+                self.session_id = None
+                self.login()
+            elif self._session_pool is not None:  # additional session from pool
+                logger.info("Session was rejected by server, logging in again")
+                headers["X-RPC-Auth-Session"] = self._login_session()
+                return True
+            headers["X-RPC-Auth-Session"] = self.session_id
+        return True
+
+    def _backoff(self, attempt: int) -> float:
+        """Return the time to wait before retry number ``attempt`` (full jitter)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_factor * 2**attempt))
+
+    def _post(
+        self,
+        payload: typing.Any,
+        headers: typing.Dict[str, typing.Any],
+        send: typing.Optional[typing.Callable[[typing.Any, typing.Dict], typing.Any]] = None,
+    ) -> typing.Any:
+        """Send the request with ``send`` (default: ``_post_once()``), retrying on failures."""
+        calls = payload if isinstance(payload, list) else [payload]
+        idempotent = all(is_read_method(call["method"]) for call in calls)
+        attempt = 0
+        while True:
+            try:
+                return (send or self._post_once)(payload, headers)
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                if isinstance(e, requests.HTTPError):
+                    status = e.response.status_code if e.response is not None else None
+                    retry = idempotent and status in RETRY_STATUS_CODES
+                else:
+                    retry = idempotent or _not_connected(e)
+                if not retry or attempt >= self.retries:
+                    raise
+                delay = self._backoff(attempt)
+                attempt += 1
+                logger.warning("Request failed (%s), retry %d in %.1fs", e, attempt, delay)
+                time.sleep(delay)
+
+    @contextlib.contextmanager
+    def _limit(self) -> typing.Iterator[None]:
+        """Wait for the rate and concurrency limiters, hold a slot for the ``with`` block."""
+        if self.rate_limiter:
+            self.rate_limiter.acquire()
+        if not self.concurrency_limiter:
+            yield
+            return
+        self.concurrency_limiter.acquire()
+        start, ok = time.monotonic(), False
+        try:
+            yield
+            ok = True
+        except GeneratorExit:  # the caller stopped reading a streaming response
+            ok = True
+            raise
+        except requests.HTTPError as e:  # only server-side errors signal overload
+            status = e.response.status_code if e.response is not None else 500
+            ok = status < 500 and status != 429
+            raise
+        finally:
+            self.concurrency_limiter.release(time.monotonic() - start, ok)
+
+    def _post_once(self, payload: typing.Any, headers: typing.Dict[str, typing.Any]) -> typing.Any:
+        with self._limit():
+            return self._post_http(payload, headers)
+
+    def _post_http(self, payload: typing.Any, headers: typing.Dict[str, typing.Any]) -> typing.Any:
+        logger.debug("Sending request, payload = %s", payload)
+
+        timestamp, start = time.time(), time.monotonic()
+        res = None
+        result = None
+        try:
+            # You must initialize logging, otherwise you'll not see debug output.
+            res = self._http_session().post(
+                self.jsonrpc_url, data=codec.dumps_bytes(payload), headers=headers
+            )
+            res.raise_for_status()
+            result = codec.loads(res.content)
+            return result
+        finally:
+            self._observe(
+                payload,
+                res,
+                result,
+                timestamp=timestamp,
+                latency=time.monotonic() - start,
+                response_bytes=len(res.content) if res is not None else 0,
+            )
+
+    def _observe(
+        self,
+        payload: typing.Any,
+        res: typing.Optional[requests.Response],
+        result: typing.Any,
+        *,
+        timestamp: float,
+        latency: float,
+        response_bytes: int
+    ) -> None:
+        """Update the metrics and the recording with a request and its decoded ``result``.
+
+        ``result`` is ``None`` if the request failed.
+        """
+        method = "batch" if isinstance(payload, list) else payload["method"]
+        body = res.request.body if res is not None else None
+        # The client always sends the encoded payload, never a stream.
+        request_bytes = len(body) if isinstance(body, (bytes, str)) else 0
+        self.metrics.observe(
+            method,
+            latency,
+            request_bytes=request_bytes,
+            response_bytes=response_bytes,
+            error=result is None or (isinstance(result, dict) and "error" in result),
+        )
+        if self.recorder is not None:
+            self.recorder.record(
+                payload,
+                result,
+                status=res.status_code if res is not None else None,
+                timestamp=timestamp,
+                duration=latency,
+                request_bytes=request_bytes,
+                response_bytes=response_bytes,
+            )
+
     def _send_request(
         self,
         method: str,
@@ -70,28 +518,283 @@ class Client:
         extra_headers: typing.Optional[typing.Dict[str, typing.Any]] = None,
         is_login: bool = False
     ) -> typing.Dict[str, typing.Any]:
-        if not is_login and not self.session_id:
-            raise Exception("Must login first!")
+        if not is_login:
+            self._check_logged_in()
+        payload = self._make_payload(method, params)
+        if is_login:  # never send a session id when logging in
+            return self._post(payload, {**(extra_headers or {})})
+        with self._checkout_headers(extra_headers) as headers:
+            response = self._post(payload, headers)
+            if self._relogin(response, headers):
+                response = self._post(payload, headers)
+        return response
 
-        headers = {**(extra_headers or {})}  # copy
-        if self.session_id:
-            headers["X-RPC-Auth-Session"] = self.session_id
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Return the request metrics by JSON-RPC method, see ``Metrics.stats()``."""
+        return self.metrics.stats()
 
-        params = params or {}
-        params["apikey"] = self.api_key
+    def query_version(self):
+        """Return server version."""
+        return self.query("idoit.version")["result"]["version"]
 
-        payload = {"method": method, "params": params, "jsonrpc": "2.0", "id": self._next_req_no()}
+    def query(self, command, params=None):
+        if self.cache is None:
+            return self._send_request(command, params=params or {})
+        response = self.cache.get(command, params)
+        if response is None:
+            response = self._send_request(command, params=params or {})
+            self.cache.put(command, params, response)
+            self.cache.notify_write(command)
+        return response
 
-        logger.debug("Sending request, payload = %s", payload)
+    def iter_query(
+        self, command: str, params=None, *, chunk_size: int = 1 << 16
+    ) -> typing.Iterator[typing.Any]:
+        """Yield the elements of the result array of ``command`` while receiving it.
 
-        # You must initialize logging, otherwise you'll not see debug output.
-        res = requests.post(self.jsonrpc_url, json=payload, headers=headers)
-        res.raise_for_status()
-        return res.json()
+        The response body is read in chunks of ``chunk_size`` bytes and decoded
+        incrementally, so the memory use is bounded by the largest element rather than by
+        the whole response, e.g., for unfiltered ``cmdb.objects.read`` calls.
+        """
+        self._check_logged_in()
+        payload = self._make_payload(command, params)
+        with self._checkout_headers() as headers:
+            yielded = False
+            try:
+                for element in self._post_stream(payload, headers, chunk_size):
+                    yielded = True
+                    yield element
+            except ResponseError as e:
+                if yielded or not self._relogin({"error": e.error}, headers):
+                    raise
+                yield from self._post_stream(payload, headers, chunk_size)
 
-    def query_version(self):
-        """Return server version."""
-        return self._send_request("idoit.version")["result"]["version"]
+    def _open_stream(
+        self, payload: typing.Any, headers: typing.Dict[str, typing.Any]
+    ) -> typing.Tuple[requests.Response, contextlib.ExitStack, float, float]:
+        """Send streaming request, return the response, the stack holding the limiter slot,
+        and the timestamp and monotonic time of the start of the request.
 
-    def query(self, command, params=None):
-        return self._send_request(command, params=params or {})
+        The response body is not read yet, the stack must be closed once it has been.
+        """
+        timestamp, start = time.time(), time.monotonic()
+        res = None
+        try:
+            with contextlib.ExitStack() as stack:
+                stack.enter_context(self._limit())
+                logger.debug("Sending streaming request, payload = %s", payload)
+                res = self._http_session().post(
+                    self.jsonrpc_url, data=codec.dumps_bytes(payload), headers=headers, stream=True
+                )
+                stack.callback(res.close)
+                res.raise_for_status()
+                return res, stack.pop_all(), timestamp, start
+        except requests.RequestException:
+            latency = time.monotonic() - start
+            self._observe(
+                payload, res, None, timestamp=timestamp, latency=latency, response_bytes=0
+            )
+            raise
+
+    def _post_stream(
+        self, payload: typing.Any, headers: typing.Dict[str, typing.Any], chunk_size: int
+    ) -> typing.Iterator[typing.Any]:
+        """Send ``payload`` with retries and yield the elements of the result array."""
+        res, stack, timestamp, start = self._post(payload, headers, send=self._open_stream)
+        response_bytes, result = 0, None
+        elements: typing.List[typing.Any] = []
+
+        def chunks():
+            nonlocal response_bytes
+            for chunk in res.iter_content(chunk_size):
+                response_bytes += len(chunk)
+                yield chunk
+
+        error: typing.Optional[ResponseError] = None
+        try:
+            with stack:
+                try:
+                    for element in iter_json_array(chunks()):
+                        if self.recorder is not None:  # the recording holds the whole response
+                            elements.append(element)
+                        yield element
+                except ResponseError as e:  # not a failure of the request itself
+                    error = e
+            if error is not None:
+                result = {"jsonrpc": "2.0", "id": payload["id"], "error": error.error}
+                raise error
+            result = {"jsonrpc": "2.0", "id": payload["id"], "result": elements}
+        finally:
+            self._observe(
+                payload,
+                res,
+                result,
+                timestamp=timestamp,
+                latency=time.monotonic() - start,
+                response_bytes=response_bytes,
+            )
+
+    def query_many(
+        self,
+        calls: typing.Iterable[typing.Tuple[str, typing.Optional[typing.Dict[str, typing.Any]]]],
+        *,
+        batch_size: typing.Optional[int] = None,
+        concurrency: int = 1
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Send many ``(command, params)`` calls as JSON-RPC 2.0 batch requests.
+
+        Up to ``batch_size`` calls are packed into one HTTP POST (all calls if ``None``) and
+        up to ``concurrency`` batches are sent in parallel.  The responses are correlated to
+        the calls by their request id and returned in the order of submission.  Each
+        response is the raw JSON-RPC response object, so failed calls carry an ``"error"``
+        rather than a ``"result"`` entry and do not affect the other calls.
+        """
+        self._check_logged_in()
+        payloads = [self._make_payload(command, params) for command, params in calls]
+        if not payloads:
+            return []
+        batch_size = batch_size or len(payloads)
+        batches = [
+            payloads[start : start + batch_size] for start in range(0, len(payloads), batch_size)
+        ]
+        if concurrency > 1 and len(batches) > 1:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(self._post_batch, batches))
+        else:
+            results = [self._post_batch(batch) for batch in batches]
+        return [response for result in results for response in result]
+
+    def _post_batch(
+        self, batch: typing.List[typing.Dict[str, typing.Any]]
+    ) -> typing.List[typing.Any]:
+        """Send one batch request and return the responses in the order of ``batch``."""
+        with self._checkout_headers() as headers:
+            responses = self._post(batch, headers)
+            if self._relogin(responses, headers):
+                responses = self._post(batch, headers)
+        if isinstance(responses, dict):  # error on the batch as a whole
+            raise Exception("Batch request failed: %s" % responses.get("error", responses))
+        by_id = {response.get("id"): response for response in responses}
+        result = []
+        for payload in batch:
+            if payload["id"] not in by_id:
+                raise Exception("No response for request %s" % payload["id"])
+            result.append(by_id[payload["id"]])
+            if self.cache is not None:
+                self.cache.notify_write(payload["method"])
+        return result
+
+    def _query_or_error(self, command, params):
+        try:
+            return self.query(command, params)
+        except Exception as e:
+            return e
+
+    def map(
+        self,
+        command: str,
+        params_iter: typing.Iterable[typing.Optional[typing.Dict[str, typing.Any]]],
+        *,
+        concurrency: int = 8
+    ) -> typing.Iterator[typing.Union[typing.Dict[str, typing.Any], Exception]]:
+        """Run ``command`` once for each params in ``params_iter`` using a thread pool.
+
+        At most ``concurrency`` queries run in parallel.  The responses are yielded in the
+        order of ``params_iter`` as soon as they are available and ``params_iter`` is
+        consumed lazily, so only a bounded number of queries are pending at any time.  A
+        query that raises does not abort the run; instead, the exception is yielded in
+        place of its response.
+        """
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending: typing.Deque = collections.deque()
+            try:
+                for params in params_iter:
+                    pending.append(executor.submit(self._query_or_error, command, params))
+                    if len(pending) >= 2 * concurrency:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _query_many_or_errors(self, calls):
+        try:
+            return self.query_many(calls)
+        except Exception as e:
+            return [e] * len(calls)
+
+    def map_batches(
+        self,
+        command: str,
+        params_iter: typing.Iterable[typing.Optional[typing.Dict[str, typing.Any]]],
+        *,
+        batch_size: int = 100,
+        concurrency: int = 4
+    ) -> typing.Iterator[typing.Union[typing.Dict[str, typing.Any], Exception]]:
+        """Like ``map()`` but sending ``batch_size`` calls per JSON-RPC batch request.
+
+        At most ``concurrency`` batches run in parallel.  The responses are yielded in the
+        order of ``params_iter`` as soon as their batch is done; ``params_iter`` is
+        consumed lazily.  Failed calls yield their JSON-RPC error response; if a whole
+        batch fails, the exception is yielded for each of its calls.
+        """
+        params_iter = iter(params_iter)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending: typing.Deque = collections.deque()
+            try:
+                while True:
+                    batch = [(command, params) for params in islice(params_iter, batch_size)]
+                    if not batch:
+                        break
+                    pending.append(executor.submit(self._query_many_or_errors, batch))
+                    if len(pending) >= 2 * concurrency:
+                        yield from pending.popleft().result()
+                    while pending and pending[0].done():  # don't wait for slow input
+                        yield from pending.popleft().result()
+                while pending:
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def iter_objects(
+        self,
+        filter: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        order_by: typing.Optional[str] = None,
+        *,
+        sort: typing.Optional[str] = None,
+        page_size: int = 1000,
+        prefetch: bool = True
+    ) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """Yield the objects from ``cmdb.objects.read`` one by one, fetching page by page.
+
+        The objects are ordered by the field ``order_by`` in ``sort`` order (``"ASC"`` or
+        ``"DESC"``).  The pages of ``page_size`` objects are fetched using the ``limit``
+        parameter.  With ``prefetch``, the next page is fetched in the background while the
+        current one is consumed.
+        """
+        params: typing.Dict[str, typing.Any] = {}
+        if filter:
+            params["filter"] = filter
+        if order_by:
+            params["order_by"] = order_by
+        if sort:
+            params["sort"] = sort
+
+        def fetch(offset):
+            limit = "%d,%d" % (offset, page_size)
+            return self.query("cmdb.objects.read", {**params, "limit": limit})["result"]
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page: typing.List[typing.Dict[str, typing.Any]] = fetch(0)
+            offset = 0
+            while page:
+                offset += page_size
+                is_last = len(page) < page_size
+                if prefetch and not is_last:
+                    next_page = executor.submit(fetch, offset)
+                yield from page
+                if is_last:
+                    break
+                page = next_page.result() if prefetch else fetch(offset)
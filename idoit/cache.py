@@ -0,0 +1,30 @@
+"""Implementation of ``idoit-cli cache`` command.
+
+Shows statistics of or clears the on-disk response cache.
+"""
+
+import argparse
+
+from logzero import logger
+
+from .caching import DiskCache
+from .common import disk_cache_path, pprint
+
+
+def setup_argparse(parser: argparse.ArgumentParser) -> None:
+    """Main entry point for subcommand."""
+
+    parser.add_argument("action", choices=("stats", "clear"), help="Action to perform")
+
+
+def run(args, parser, subparser):
+    """Main entry point for cache command."""
+    cache = DiskCache(disk_cache_path(args))
+    try:
+        if args.action == "clear":
+            cache.clear()
+            logger.info("Cleared response cache %s", cache.path)
+        else:
+            pprint(cache.stats())
+    finally:
+        cache.close()
@@ -0,0 +1,315 @@
+"""Caching of responses to read-only JSON-RPC methods."""
+
+import collections
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import typing
+
+from logzero import logger
+
+from . import codec
+
+#: Default time to live in seconds of the responses by method; only these are cached.
+DEFAULT_TTLS: typing.Dict[str, float] = {
+    "idoit.version": 3600.0,
+    "idoit.constants": 3600.0,
+    "cmdb.object_types.read": 3600.0,
+    "cmdb.dialog.read": 600.0,
+    "cmdb.object.read": 60.0,
+}
+
+#: Suffixes of the methods that modify the CMDB.
+WRITE_METHOD_SUFFIXES = (
+    ".create",
+    ".update",
+    ".delete",
+    ".archive",
+    ".purge",
+    ".quickpurge",
+    ".recycle",
+    ".save",
+)
+
+
+#: Methods that do not modify any state on the server besides those ending in ``.read``.
+READ_METHODS = ("idoit.version", "idoit.constants", "idoit.search")
+
+
+def canonical_method(method: str) -> str:
+    """Return ``method`` with i-doit's short form ``cmdb.<x>`` expanded to ``cmdb.<x>.read``."""
+    if method.startswith("cmdb.") and method.count(".") == 1:
+        return method + ".read"
+    return method
+
+
+def is_write_method(method: str) -> bool:
+    """Return whether ``method`` modifies the CMDB."""
+    return method.endswith(WRITE_METHOD_SUFFIXES)
+
+
+def is_read_method(method: str) -> bool:
+    """Return whether ``method`` is read-only and thus safe to repeat."""
+    method = canonical_method(method)
+    return method.endswith(".read") or method in READ_METHODS
+
+
+def cache_key(method: str, params: typing.Optional[typing.Dict[str, typing.Any]]) -> str:
+    """Return canonical key for calling ``method`` with ``params``."""
+    return json.dumps([method, params or {}], sort_keys=True, separators=(",", ":"))
+
+
+class BaseCache:
+    """Base class for the response caches used by ``idoit.api.Client``.
+
+    Only successful responses of the methods in ``ttls`` are cached, with the time to live
+    in seconds given by the value.  Object counts (``countobjects``) are never cached as
+    they change with every object created or deleted.
+    """
+
+    def __init__(self, ttls: typing.Optional[typing.Dict[str, float]] = None):
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+
+    def is_cacheable(
+        self, method: str, params: typing.Optional[typing.Dict[str, typing.Any]] = None
+    ) -> bool:
+        """Return whether responses to calling ``method`` with ``params`` are cached."""
+        return canonical_method(method) in self.ttls and not (params or {}).get("countobjects")
+
+    def bind(self, client: typing.Any) -> None:
+        """Called by ``client`` after logging in, before the cache is used."""
+
+    def get(
+        self, method: str, params: typing.Optional[typing.Dict[str, typing.Any]]
+    ) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """Return cached response or ``None`` if there is no such unexpired response."""
+        raise NotImplementedError("Abstract method called.")
+
+    def put(
+        self,
+        method: str,
+        params: typing.Optional[typing.Dict[str, typing.Any]],
+        response: typing.Dict[str, typing.Any],
+    ) -> None:
+        """Store ``response`` if ``method`` is cacheable and the call was successful."""
+        raise NotImplementedError("Abstract method called.")
+
+    def invalidate(self, prefix: str = "") -> None:
+        """Drop all responses of methods starting with ``prefix`` (all by default)."""
+        raise NotImplementedError("Abstract method called.")
+
+    def notify_write(self, method: str) -> None:
+        """Invalidate the responses that might be stale after calling ``method``.
+
+        Writes to the CMDB drop all cached ``cmdb.*`` responses while ``idoit.*`` responses
+        such as the constants are kept.
+        """
+        if is_write_method(method):
+            self.invalidate(method.split(".", 1)[0] + ".")
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """Return hit/miss counters and the current size."""
+        raise NotImplementedError("Abstract method called.")
+
+    def close(self) -> None:
+        """Release the resources held by the cache."""
+
+    def _should_store(
+        self,
+        method: str,
+        params: typing.Optional[typing.Dict[str, typing.Any]],
+        response: typing.Dict[str, typing.Any],
+    ) -> bool:
+        return (
+            self.is_cacheable(method, params) and not response.get("error") and "result" in response
+        )
+
+
+class ResponseCache(BaseCache):
+    """In-memory cache of JSON-RPC responses with per-method TTL and LRU eviction.
+
+    At most ``max_size`` responses are kept, evicting the least recently used one first.
+    The cache is thread-safe and returns copies, so callers may modify the responses.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttls: typing.Optional[typing.Dict[str, float]] = None,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        super().__init__(ttls)
+        self.max_size = max_size
+        self.clock = clock
+        #: Mapping from key to (method, expiry time, response), in LRU order.
+        self._entries: "collections.OrderedDict[str, typing.Tuple[str, float, typing.Any]]"
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, method, params):
+        if not self.is_cacheable(method, params):
+            return None
+        method = canonical_method(method)
+        key = cache_key(method, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < self.clock():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return copy.deepcopy(entry[2])
+
+    def put(self, method, params, response):
+        if not self._should_store(method, params, response):
+            return
+        method = canonical_method(method)
+        key = cache_key(method, params)
+        expires = self.clock() + self.ttls[method]
+        with self._lock:
+            self._entries[key] = (method, expires, copy.deepcopy(response))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, prefix=""):
+        with self._lock:
+            for key in [k for k, (m, _, _) in self._entries.items() if m.startswith(prefix)]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+            }
+
+
+class DiskCache(BaseCache):
+    """Cache of JSON-RPC responses in a SQLite database shared by all processes.
+
+    The responses are keyed by server URL, server version, method, and parameters, so
+    upgrading the server invalidates the cache.  Concurrent processes are synchronized by
+    SQLite's file locking; writers wait up to ``timeout`` seconds for the lock.  Hit and
+    miss counters are persisted in the database as well.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttls: typing.Optional[typing.Dict[str, float]] = None,
+        timeout: float = 30.0,
+        clock: typing.Callable[[], float] = time.time,
+    ):
+        super().__init__(ttls)
+        #: Path to the SQLite database.
+        self.path = path
+        self.clock = clock
+        #: Prefix of the keys, set to server URL and version in ``bind()``.
+        self.scope = ""
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        # The responses may contain confidential data, so create the database private.
+        os.close(os.open(path, os.O_WRONLY | os.O_CREAT, 0o600))
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (scope TEXT NOT NULL, key TEXT NOT NULL, "
+                "method TEXT NOT NULL, expires REAL NOT NULL, response TEXT NOT NULL, "
+                "PRIMARY KEY (scope, key))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER)"
+            )
+
+    def bind(self, client):
+        # The version is cached per server URL only, all other responses per URL and version.
+        self.scope = client.server_url
+        version = client.query_version()
+        self.scope = "%s|%s" % (client.server_url, version)
+        logger.debug("Using response cache %s for %s", self.path, self.scope)
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE expires < ?", (self.clock(),))
+
+    def _count(self, name: str) -> None:
+        self._conn.execute(
+            "INSERT INTO counters (name, value) VALUES (?, 1) "
+            "ON CONFLICT (name) DO UPDATE SET value = value + 1",
+            (name,),
+        )
+
+    def get(self, method, params):
+        if not self.is_cacheable(method, params):
+            return None
+        method = canonical_method(method)
+        key = cache_key(method, params)
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE scope = ? AND key = ? AND expires >= ?",
+                (self.scope, key, self.clock()),
+            ).fetchone()
+            self._count("misses" if row is None else "hits")
+        return None if row is None else codec.loads(row[0])
+
+    def put(self, method, params, response):
+        if not self._should_store(method, params, response):
+            return
+        method = canonical_method(method)
+        values = (
+            self.scope,
+            cache_key(method, params),
+            method,
+            self.clock() + self.ttls[method],
+            codec.dumps(response),
+        )
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)", values)
+
+    def invalidate(self, prefix=""):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM responses WHERE scope = ? AND substr(method, 1, ?) = ?",
+                (self.scope, len(prefix), prefix),
+            )
+
+    def clear(self) -> None:
+        """Remove all responses of all servers and reset the counters."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.execute("DELETE FROM counters")
+            self._conn.execute("VACUUM")
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+            size, expired = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(expires < ?), 0) FROM responses", (self.clock(),)
+            ).fetchone()
+            methods = dict(
+                self._conn.execute("SELECT method, COUNT(*) FROM responses GROUP BY method")
+            )
+        return {
+            "hits": counters.get("hits", 0),
+            "misses": counters.get("misses", 0),
+            "size": size,
+            "expired": expired,
+            "methods": methods,
+            "bytes": os.path.getsize(self.path),
+        }
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self._conn.close()
@@ -7,7 +7,7 @@ import argparse
 
 from logzero import logger
 
-from .api import Client
+from .common import make_client
 
 
 def setup_argparse(_parser: argparse.ArgumentParser) -> None:
@@ -16,6 +16,6 @@ def setup_argparse(_parser: argparse.ArgumentParser) -> None:
 
 def run(args, parser, subparser):
     """Main entry point for check command."""
-    with Client(args.idoit_url, args.idoit_user, args.idoit_password, args.idoit_api_key) as client:
+    with make_client(args) as client:
         version = client.query_version()
     logger.info("OK, server version is %s", version)
@@ -0,0 +1,129 @@
+"""JSON encoding and decoding using the fastest available library.
+
+Uses ``orjson`` or ``ujson`` if installed and falls back to the ``json`` module from the
+standard library.  Set the environment variable ``IDOIT_JSON_CODEC`` to ``json``, ``ujson``,
+or ``orjson`` to select a specific codec.
+"""
+
+import json
+import os
+import typing
+
+from logzero import logger
+
+
+class Codec:
+    """JSON codec based on the standard library's ``json`` module."""
+
+    #: Name of the codec.
+    name = "json"
+
+    def dumps(self, obj: typing.Any, indent: typing.Optional[int] = None) -> str:
+        """Encode ``obj`` as JSON string."""
+        return json.dumps(obj, indent=indent)
+
+    def dumps_bytes(self, obj: typing.Any) -> bytes:
+        """Encode ``obj`` as compact UTF-8 encoded JSON, e.g., for request bodies."""
+        return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+    def loads(self, data: typing.Union[bytes, str]) -> typing.Any:
+        """Decode JSON from ``data``."""
+        return json.loads(data)
+
+
+class OrjsonCodec(Codec):
+    """JSON codec based on ``orjson``."""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+
+        self.orjson = orjson
+
+    def dumps(self, obj, indent=None):
+        if indent not in (None, 2):  # orjson only supports indentation by two spaces
+            return super().dumps(obj, indent)
+        option = self.orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= self.orjson.OPT_INDENT_2
+        return self.orjson.dumps(obj, option=option).decode("utf-8")
+
+    def dumps_bytes(self, obj):
+        return self.orjson.dumps(obj, option=self.orjson.OPT_NON_STR_KEYS)
+
+    def loads(self, data):
+        return self.orjson.loads(data)
+
+
+class UjsonCodec(Codec):
+    """JSON codec based on ``ujson``."""
+
+    name = "ujson"
+
+    def __init__(self):
+        import ujson
+
+        self.ujson = ujson
+
+    def dumps(self, obj, indent=None):
+        return self.ujson.dumps(obj, indent=indent or 0)
+
+    def dumps_bytes(self, obj):
+        return self.ujson.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+    def loads(self, data):
+        return self.ujson.loads(data)
+
+
+#: The available codecs by name, in order of preference.
+CODECS: typing.Dict[str, typing.Type[Codec]] = {
+    "orjson": OrjsonCodec,
+    "ujson": UjsonCodec,
+    "json": Codec,
+}
+
+
+def get_codec(name: typing.Optional[str] = None) -> Codec:
+    """Return codec with the given ``name`` or the fastest available one."""
+    if name:
+        return CODECS[name]()
+    for codec_cls in CODECS.values():
+        try:
+            return codec_cls()
+        except ImportError:
+            continue
+    return Codec()  # pragma: nocover
+
+
+def _codec_from_environment() -> Codec:
+    """Return the codec selected by ``IDOIT_JSON_CODEC``, the standard library's if unusable."""
+    name = os.environ.get("IDOIT_JSON_CODEC")
+    try:
+        return get_codec(name)
+    except KeyError:
+        logger.warning(
+            "Unknown JSON codec %r in IDOIT_JSON_CODEC, choose from %s", name, ", ".join(CODECS)
+        )
+    except ImportError as e:
+        logger.warning("JSON codec %r in IDOIT_JSON_CODEC is not available: %s", name, e)
+    return Codec()
+
+
+#: The codec used by idoit-py.
+codec = _codec_from_environment()
+
+
+def dumps(obj: typing.Any, indent: typing.Optional[int] = None) -> str:
+    """Encode ``obj`` as JSON string with the selected codec."""
+    return codec.dumps(obj, indent)
+
+
+def dumps_bytes(obj: typing.Any) -> bytes:
+    """Encode ``obj`` as compact UTF-8 encoded JSON with the selected codec."""
+    return codec.dumps_bytes(obj)
+
+
+def loads(data: typing.Union[bytes, str]) -> typing.Any:
+    """Decode JSON from ``data`` with the selected codec."""
+    return codec.loads(data)
@@ -1,12 +1,21 @@
 """Shared code."""
 
-import json
+import os
 import sys
+import typing
 
 from pygments import highlight
 from pygments.lexers import PythonLexer
 from pygments.formatters import Terminal256Formatter
 
+from . import codec
+from .api import Client
+from .caching import DiskCache
+from .mirror import LocalClient, Mirror
+from .recording import ReplayAdapter
+from .session_cache import SessionCache
+from .throttle import AdaptiveConcurrencyLimiter, TokenBucket
+
 
 def run_nocmd(_, parser, subparser=None):  # pragma: no cover
     """No command given, print help and ``exit(1)``."""
@@ -18,12 +27,68 @@ def run_nocmd(_, parser, subparser=None):  # pragma: no cover
         parser.exit(1)
 
 
+def disk_cache_path(args) -> str:
+    """Return path to the on-disk response cache from the global command line arguments."""
+    return os.path.join(args.cache_dir, "responses.sqlite3")
+
+
+def mirror_path(args) -> str:
+    """Return path to the local mirror from the global command line arguments."""
+    return args.mirror_path or os.path.join(args.cache_dir, "mirror.sqlite3")
+
+
+def add_local_argument(parser) -> None:
+    """Add the ``--local`` flag selecting the local mirror to a subcommand's ``parser``."""
+    parser.add_argument(
+        "--local",
+        action="store_true",
+        default=False,
+        help="Answer from the local mirror written by sync rather than the server",
+    )
+
+
+def make_client(args, **kwargs) -> typing.Union[Client, LocalClient]:
+    """Construct ``Client`` from the global command line arguments.
+
+    Additional keyword arguments are passed to the ``Client`` constructor.  Returns a
+    ``LocalClient`` reading from the local mirror instead if the subcommand was called with
+    ``--local``.
+    """
+    if getattr(args, "local", False):
+        return LocalClient(Mirror(mirror_path(args)))
+    session_cache = None
+    if args.session_cache:
+        session_cache = SessionCache(args.session_cache_path)
+    if args.cache and "cache" not in kwargs:
+        kwargs["cache"] = DiskCache(disk_cache_path(args))
+    if args.rate_limit:
+        kwargs["rate_limiter"] = TokenBucket(args.rate_limit)
+    if args.adaptive_concurrency:
+        kwargs["concurrency_limiter"] = AdaptiveConcurrencyLimiter()
+    if args.metrics is not None:
+        kwargs["metrics"] = args.metrics
+    if args.recorder is not None:
+        kwargs["recorder"] = args.recorder
+    if args.replay:
+        kwargs["adapter"] = ReplayAdapter(args.replay)
+    return Client(
+        args.idoit_url or "http://localhost",
+        args.idoit_user,
+        args.idoit_password,
+        args.idoit_api_key,
+        session_cache=session_cache,
+        sessions=args.sessions,
+        sessionless=args.sessionless,
+        **kwargs,
+    )
+
+
 def pprint(x, file=sys.stdout):
     if file.isatty():
         print(
-            highlight(json.dumps(x, indent=2), PythonLexer(), Terminal256Formatter()),
+            highlight(codec.dumps(x, indent=2), PythonLexer(), Terminal256Formatter()),
             file=file,
             end="",
         )
     else:
-        print(json.dumps(x, indent=2), file=file)
+        print(codec.dumps(x, indent=2), file=file)
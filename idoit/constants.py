@@ -5,8 +5,7 @@ Lists the constants.
 
 import argparse
 
-from .api import Client
-from .common import pprint
+from .common import make_client, pprint
 
 
 def setup_argparse(_parser: argparse.ArgumentParser) -> None:
@@ -15,6 +14,6 @@ def setup_argparse(_parser: argparse.ArgumentParser) -> None:
 
 def run(args, parser, subparser):
     """Main entry point for constants command."""
-    with Client(args.idoit_url, args.idoit_user, args.idoit_password, args.idoit_api_key) as client:
+    with make_client(args) as client:
         constants = client.query("idoit.constants")
     pprint(constants)
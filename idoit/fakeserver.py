@@ -0,0 +1,704 @@
+"""Local stand-in for the i-doit JSON-RPC API with a synthetic CMDB.
+
+Serves ``/src/jsonrpc.php`` on localhost for testing and benchmarking ``idoit.api.Client``
+without a live i-doit instance.  The objects are generated on the fly from their id and
+the ids matching a query are computed rather than searched for, so inventories of a
+million objects can be paged through with memory and time proportional to the page size
+and the number of modified objects.
+
+Use as a context manager::
+
+    with FakeServer(FakeCmdb(num_objects=10000), latency=0.01) as server:
+        with Client(server.url, "admin", "admin", server.api_key) as client:
+            ...
+
+or run ``python -m idoit.fakeserver --objects 10000`` to serve on a fixed port.
+"""
+
+import argparse
+import bisect
+import collections
+import datetime
+import http.server
+import json
+import random
+import re
+import socketserver
+import threading
+import time
+import typing
+import uuid
+
+from logzero import logger
+
+#: The object types of the synthetic CMDB: id, title, constant, and type group.
+OBJECT_TYPES = (
+    (5, "Server", "C__OBJTYPE__SERVER", "Infrastructure"),
+    (59, "Virtual machine", "C__OBJTYPE__VIRTUAL_MACHINE", "Infrastructure"),
+    (10, "Client", "C__OBJTYPE__CLIENT", "Infrastructure"),
+    (8, "Switch", "C__OBJTYPE__SWITCH", "Infrastructure"),
+    (9, "Router", "C__OBJTYPE__ROUTER", "Infrastructure"),
+    (11, "Printer", "C__OBJTYPE__PRINTER", "Infrastructure"),
+)
+
+#: Manufacturers and models for the model category.
+MODELS = (
+    ("Dell", "PowerEdge R640"),
+    ("HPE", "ProLiant DL380"),
+    ("Lenovo", "ThinkSystem SR650"),
+    ("Cisco", "Catalyst 9300"),
+)
+
+#: Record status of normal, archived, and deleted objects.
+STATUS_NORMAL, STATUS_ARCHIVED, STATUS_DELETED = 2, 3, 4
+
+#: Names of the record status as used by ``cmdb.object.delete``.
+STATUS_NAMES = {
+    "C__RECORD_STATUS__ARCHIVED": STATUS_ARCHIVED,
+    "C__RECORD_STATUS__DELETED": STATUS_DELETED,
+}
+
+#: Timestamp of the first generated object.
+EPOCH = datetime.datetime(2020, 1, 1)
+
+#: JSON-RPC error codes.
+ERR_INVALID_REQUEST = -32600
+ERR_METHOD_NOT_FOUND = -32601
+ERR_INVALID_PARAMS = -32602
+ERR_AUTH = -32604
+
+
+class RpcError(Exception):
+    """Raised by the method implementations to return a JSON-RPC error."""
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+def _timestamp(value: datetime.datetime) -> str:
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _slug(title: str) -> str:
+    return title.lower().replace(" ", "-")
+
+
+def _slice_range(
+    ids: range, skip: typing.AbstractSet[int], offset: int, count: typing.Optional[int]
+) -> typing.List[int]:
+    """Return ``count`` (all if ``None``) of ``ids`` not in ``skip``, starting at ``offset``.
+
+    Only the returned ids and ``skip`` are iterated over, not the ids before ``offset``.
+    """
+    skipped = sorted(ids.index(obj_id) for obj_id in skip if obj_id in ids)
+    pos = offset
+    while True:  # smallest index with ``offset`` ids before it that are not skipped
+        next_pos = offset + bisect.bisect_right(skipped, pos)
+        if next_pos == pos:
+            break
+        pos = next_pos
+    result: typing.List[int] = []
+    while pos < len(ids) and (count is None or len(result) < count):
+        if ids[pos] not in skip:
+            result.append(ids[pos])
+        pos += 1
+    return result
+
+
+def _page(
+    segments: typing.Iterable[typing.Tuple[typing.Sequence[int], typing.AbstractSet[int]]],
+    offset: int,
+    count: typing.Optional[int],
+) -> typing.List[int]:
+    """Return ``count`` (all if ``None``) ids starting at ``offset`` of the concatenation of
+    the ``(ids, skip)`` segments, each consisting of a range or list without ``skip``.
+    """
+    result: typing.List[int] = []
+    for ids, skip in segments:
+        remaining = None if count is None else count - len(result)
+        if remaining == 0:
+            break
+        if not isinstance(ids, range):
+            ids = [obj_id for obj_id in ids if obj_id not in skip]
+            result += ids[offset:] if remaining is None else ids[offset : offset + remaining]
+            offset = max(0, offset - len(ids))
+            continue
+        result += _slice_range(ids, skip, offset, remaining)
+        offset = max(0, offset - (len(ids) - sum(1 for obj_id in skip if obj_id in ids)))
+    return result
+
+
+class FakeCmdb:
+    """Synthetic CMDB with objects ``1`` to ``num_objects``.
+
+    The object with id ``i`` has type ``OBJECT_TYPES[i % len(OBJECT_TYPES)]`` and all other
+    properties derived from ``i``.  Updates and deletions are kept in an overlay; they must
+    not change the type of an object.  Thread-safe.
+    """
+
+    def __init__(self, num_objects: int = 1000):
+        self.num_objects = num_objects
+        self.types = {
+            type_id: (title, const, group) for type_id, title, const, group in OBJECT_TYPES
+        }
+        #: Modified properties by object id.
+        self._overlay: typing.Dict[int, typing.Dict[str, typing.Any]] = {}
+        self._lock = threading.Lock()
+
+    def _type_of(self, obj_id: int) -> int:
+        return OBJECT_TYPES[obj_id % len(OBJECT_TYPES)][0]
+
+    def type_ids(self, type_id: typing.Optional[int] = None) -> range:
+        """Return the ids of the objects of type ``type_id`` (all objects if ``None``)."""
+        if type_id is None:
+            return range(1, self.num_objects + 1)
+        indexes = [i for i, object_type in enumerate(OBJECT_TYPES) if object_type[0] == type_id]
+        if not indexes:
+            return range(0)
+        return range(indexes[0] or len(OBJECT_TYPES), self.num_objects + 1, len(OBJECT_TYPES))
+
+    def modified_ids(self) -> typing.List[int]:
+        """Return the sorted ids of the objects in the overlay."""
+        with self._lock:
+            return sorted(self._overlay)
+
+    def count(self, type_id: int) -> int:
+        """Return the number of objects of type ``type_id`` with normal status."""
+        ids = self.type_ids(type_id)
+        gone = [
+            obj_id
+            for obj_id in self.modified_ids()
+            if obj_id in ids and self.get(obj_id)["status"] != STATUS_NORMAL  # type: ignore
+        ]
+        return len(ids) - len(gone)
+
+    def _number_ranges(self, digits: str, prefix: bool) -> typing.Iterator[range]:
+        """Yield ranges of the ids whose number in the generated title starts with
+        (``prefix``) or contains ``digits``.  The ranges may overlap.
+        """
+        for width in range(6, max(6, len(str(self.num_objects))) + 1):
+            lowest = 1 if width == 6 else 10 ** (width - 1)  # no leading zeros beyond six
+            highest = min(10**width, self.num_objects + 1)
+            for pos in [0] if prefix else range(width - len(digits) + 1):
+                tail = 10 ** (width - pos - len(digits))
+                if tail < 1:
+                    continue
+                for head in range(10**pos):
+                    start = (head * 10 ** len(digits) + int(digits)) * tail
+                    if start >= highest:
+                        break
+                    if start + tail > lowest:
+                        yield range(max(start, lowest), min(start + tail, highest))
+
+    def title_ids(self, term: str) -> typing.List[int]:
+        """Return the sorted ids whose generated title contains the lower-case ``term``.
+
+        Modifications are not considered.
+        """
+        result: typing.Set[int] = set()
+        for index, (_, title, _, _) in enumerate(OBJECT_TYPES):
+            ids = self.type_ids(OBJECT_TYPES[index][0])
+            prefix = _slug(title) + "-"
+            if term in prefix:
+                result.update(ids)
+                continue
+            ranges: typing.List[range] = []
+            if term.isdigit():
+                ranges += self._number_ranges(term, prefix=False)
+            for split in range(1, len(term)):  # term spans the end of prefix and the number
+                if prefix.endswith(term[:split]) and term[split:].isdigit():
+                    ranges += self._number_ranges(term[split:], prefix=True)
+            for numbers in ranges:  # restrict to the ids of this type
+                first = numbers.start + (ids.start - numbers.start) % ids.step
+                result.update(range(first, numbers.stop, ids.step))
+        return sorted(result)
+
+    def get(self, obj_id: int) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """Return the object with the given id as row of ``cmdb.objects.read`` or ``None``."""
+        if not 1 <= obj_id <= self.num_objects:
+            return None
+        type_id = self._type_of(obj_id)
+        type_title, _, type_group = self.types[type_id]
+        created = _timestamp(EPOCH + datetime.timedelta(minutes=obj_id))
+        obj = {
+            "id": obj_id,
+            "title": "%s-%06d" % (type_title.lower().replace(" ", "-"), obj_id),
+            "sysid": "SYSID_%010d" % obj_id,
+            "type": type_id,
+            "created": created,
+            "updated": created,
+            "type_title": type_title,
+            "type_group_title": type_group,
+            "status": STATUS_NORMAL,
+            "cmdb_status": 6,
+            "cmdb_status_title": "in operation",
+            "image": "images/objecttypes/%d.png" % type_id,
+        }
+        with self._lock:
+            obj.update(self._overlay.get(obj_id, {}))
+        return obj
+
+    def iter_objects(self) -> typing.Iterator[typing.Dict[str, typing.Any]]:
+        """Yield all objects, including archived and deleted ones."""
+        for obj_id in self.type_ids():
+            yield typing.cast(typing.Dict[str, typing.Any], self.get(obj_id))
+
+    def update(self, obj_id: int, *, touch: bool = True, **fields) -> None:
+        """Update the fields of an object, with ``touch`` also its ``updated`` timestamp."""
+        if self.get(obj_id) is None:
+            raise KeyError(obj_id)
+        with self._lock:
+            overlay = self._overlay.setdefault(obj_id, {})
+            overlay.update(fields)
+            if touch:
+                overlay["updated"] = _timestamp(datetime.datetime.now())
+
+    def delete(self, obj_id: int, status: int = STATUS_DELETED, *, touch: bool = True) -> None:
+        """Archive or delete an object."""
+        self.update(obj_id, status=status, touch=touch)
+
+    def categories(
+        self, obj_id: int
+    ) -> typing.Dict[str, typing.List[typing.Dict[str, typing.Any]]]:
+        """Return the category entries of an object by category constant."""
+        obj = self.get(obj_id)
+        if obj is None:
+            return {}
+        manufacturer, model = MODELS[obj_id % len(MODELS)]
+        return {
+            "C__CATG__GLOBAL": [
+                {
+                    "id": obj_id,
+                    "objID": obj_id,
+                    "title": obj["title"],
+                    "sysid": obj["sysid"],
+                    "description": "Synthetic %s" % obj["type_title"].lower(),
+                }
+            ],
+            "C__CATG__IP": [
+                {
+                    "id": obj_id,
+                    "objID": obj_id,
+                    "hostname": obj["title"],
+                    "domain": "example.com",
+                    "ipv4_address": "10.%d.%d.%d"
+                    % ((obj_id >> 16) & 255, (obj_id >> 8) & 255, obj_id & 255),
+                }
+            ],
+            "C__CATG__MODEL": [
+                {
+                    "id": obj_id,
+                    "objID": obj_id,
+                    "manufacturer": manufacturer,
+                    "title": model,
+                    "serial": "SN%08X" % (obj_id * 2654435761 % 2**32),
+                }
+            ],
+        }
+
+
+def _parse_limit(limit: typing.Any) -> typing.Tuple[int, typing.Optional[int]]:
+    """Parse ``limit`` parameter of ``cmdb.objects.read`` into offset and count."""
+    if limit is None:
+        return 0, None
+    if isinstance(limit, int):
+        return 0, limit
+    parts = str(limit).split(",")
+    if len(parts) == 1:
+        return 0, int(parts[0])
+    return int(parts[0]), int(parts[1])
+
+
+class FakeApi:
+    """Implementation of the JSON-RPC methods on top of a ``FakeCmdb``."""
+
+    def __init__(self, cmdb: FakeCmdb, user: str, password: str, api_key: str):
+        self.cmdb = cmdb
+        self.user = user
+        self.password = password
+        self.api_key = api_key
+        #: Valid session ids.
+        self.sessions: typing.Set[str] = set()
+        #: Number of calls by method.
+        self.calls: typing.Counter[str] = collections.Counter()
+        self._lock = threading.Lock()
+
+    def call(
+        self, method: str, params: typing.Dict[str, typing.Any], headers: typing.Any
+    ) -> typing.Any:
+        """Dispatch call of ``method`` with ``params`` and the HTTP request ``headers``."""
+        with self._lock:
+            self.calls[method] += 1
+        if params.get("apikey") != self.api_key:
+            raise RpcError(ERR_AUTH, "Invalid API key")
+        if method != "idoit.login":
+            self._authenticate(headers)
+        impl = getattr(self, "_" + method.replace(".", "_"), None)
+        if impl is None and method.startswith("cmdb."):  # i-doit defaults to the read action
+            impl = getattr(self, "_" + method.replace(".", "_") + "_read", None)
+        if impl is None:
+            raise RpcError(ERR_METHOD_NOT_FOUND, "Method %s not found" % method)
+        return impl(params, headers)
+
+    def _check_credentials(self, headers) -> None:
+        user = headers.get("X-RPC-Auth-Username")
+        password = headers.get("X-RPC-Auth-Password")
+        if (user, password) != (self.user, self.password):
+            raise RpcError(ERR_AUTH, "Login failed")
+
+    def _authenticate(self, headers) -> None:
+        session_id = headers.get("X-RPC-Auth-Session")
+        if session_id:
+            with self._lock:
+                if session_id not in self.sessions:
+                    raise RpcError(ERR_AUTH, "Session %s is invalid" % session_id)
+        elif headers.get("X-RPC-Auth-Username"):
+            self._check_credentials(headers)
+
+    def _idoit_login(self, params, headers):
+        self._check_credentials(headers)
+        session_id = uuid.uuid4().hex
+        with self._lock:
+            self.sessions.add(session_id)
+        return {"result": True, "userid": "9", "name": self.user, "session-id": session_id}
+
+    def _idoit_logout(self, params, headers):
+        with self._lock:
+            self.sessions.discard(headers.get("X-RPC-Auth-Session"))
+        return {"message": "Logout successful", "result": True}
+
+    def _idoit_version(self, params, headers):
+        return {"login": {"username": self.user}, "version": "1.14.2", "type": "OPEN"}
+
+    def _idoit_constants(self, params, headers):
+        return {
+            "objectTypes": {const: title for _, (title, const, _) in self.cmdb.types.items()},
+            "categories": {
+                "g": {
+                    "C__CATG__GLOBAL": "General",
+                    "C__CATG__IP": "Host address",
+                    "C__CATG__MODEL": "Model",
+                },
+                "s": {},
+            },
+            "recordStates": {"C__RECORD_STATUS__NORMAL": "Normal"},
+        }
+
+    def _idoit_search(self, params, headers):
+        term = str(params.get("q", "")).lower()
+        if not term:
+            raise RpcError(ERR_INVALID_PARAMS, "Parameter q is missing")
+        modified = self.cmdb.modified_ids()
+        ids = set(self.cmdb.title_ids(term)).difference(modified)
+        for obj_id in modified:
+            obj = self.cmdb.get(obj_id)
+            if obj and obj["status"] == STATUS_NORMAL and term in obj["title"].lower():
+                ids.add(obj_id)
+        result = []
+        for obj_id in sorted(ids):
+            obj = typing.cast(typing.Dict[str, typing.Any], self.cmdb.get(obj_id))
+            result.append(
+                {
+                    "documentId": str(obj_id),
+                    "key": "%s > Global > Title" % obj["type_title"],
+                    "value": obj["title"],
+                    "type": "cmdb",
+                    "link": "/?objID=%d" % obj_id,
+                    "score": 100,
+                }
+            )
+        return result
+
+    def _cmdb_object_types_read(self, params, headers):
+        result = [
+            {"id": str(type_id), "title": title, "const": const, "type_group_title": group}
+            for type_id, (title, const, group) in sorted(self.cmdb.types.items())
+        ]
+        if params.get("countobjects"):
+            for object_type in result:
+                object_type["objectcount"] = str(self.cmdb.count(int(object_type["id"])))
+        return result
+
+    def _matches(self, obj, filter_, status) -> bool:
+        return not (
+            obj is None
+            or obj["status"] != status
+            or ("type" in filter_ and obj["type"] != int(filter_["type"]))
+            or ("title" in filter_ and obj["title"] != filter_["title"])
+            or ("sysid" in filter_ and obj["sysid"] != filter_["sysid"])
+        )
+
+    def _candidate_ids(self, filter_, status) -> typing.Optional[typing.List[int]]:
+        """Return the few ids that may match ``filter_``, ``None`` if these are too many."""
+        modified = self.cmdb.modified_ids()
+        if filter_.get("ids") is not None:
+            return [int(obj_id) for obj_id in filter_["ids"]]
+        if status != STATUS_NORMAL:  # only modified objects have another status
+            return modified
+        match = re.match(r"^SYSID_(\d+)$", str(filter_.get("sysid", "")))
+        if match is None:
+            match = re.match(r"^.*-(\d{6,})$", str(filter_.get("title", "")))
+        if match is not None:
+            return sorted({int(match.group(1))}.union(modified))
+        if "title" in filter_ or "sysid" in filter_:
+            return modified
+        return None
+
+    def _cmdb_objects_read(self, params, headers):
+        """Objects by filter, sorted by id, by ``updated``, or else by any field.
+
+        Without ``ids``, ``title``, or ``sysid`` filter, the ids of the requested page are
+        computed from the id layout for the former two orders.
+        """
+        filter_ = params.get("filter") or {}
+        status = int(filter_.get("status", STATUS_NORMAL))
+        order_by = params.get("order_by")
+        descending = bool(order_by) and str(params.get("sort", "ASC")).upper() == "DESC"
+        offset, count = _parse_limit(params.get("limit"))
+        candidates = self._candidate_ids(filter_, status)
+        if candidates is None and order_by in (None, "id", "created", "updated"):
+            ids = self.cmdb.type_ids(int(filter_["type"]) if "type" in filter_ else None)
+            modified = [obj_id for obj_id in self.cmdb.modified_ids() if obj_id in ids]
+            matching = {
+                obj_id
+                for obj_id in modified
+                if self._matches(self.cmdb.get(obj_id), filter_, status)
+            }
+            segments: typing.List[typing.Tuple[typing.Sequence[int], typing.Set[int]]]
+            if order_by != "updated":
+                segments = [(ids[::-1] if descending else ids, set(modified) - matching)]
+            else:  # modified objects have the latest timestamps
+                latest = sorted(
+                    sorted(matching),
+                    key=lambda obj_id: self.cmdb.get(obj_id)["updated"],  # type: ignore
+                    reverse=descending,
+                )
+                segments = [(ids, set(modified)), (latest, set())]
+                if descending:
+                    segments = [(latest, set()), (ids[::-1], set(modified))]
+            return [self.cmdb.get(obj_id) for obj_id in _page(segments, offset, count)]
+
+        if candidates is None:  # other orders need all objects
+            candidates = self.cmdb.type_ids(int(filter_["type"]) if "type" in filter_ else None)
+        objs = (self.cmdb.get(obj_id) for obj_id in candidates)
+        result = [obj for obj in objs if self._matches(obj, filter_, status)]
+        if order_by:
+            result.sort(key=lambda obj: obj[order_by], reverse=descending)
+        return result[offset:] if count is None else result[offset : offset + count]
+
+    def _cmdb_object_read(self, params, headers):
+        obj = self.cmdb.get(int(params.get("id", 0)))
+        if obj is None:
+            return []
+        result = {k: v for k, v in obj.items() if k not in ("type", "type_group_title")}
+        result["objecttype"] = obj["type"]
+        result["type_icon"] = obj["image"]
+        return result
+
+    def _cmdb_object_update(self, params, headers):
+        fields = {k: v for k, v in params.items() if k not in ("id", "apikey")}
+        try:
+            self.cmdb.update(int(params.get("id", 0)), **fields)
+        except KeyError:
+            raise RpcError(ERR_INVALID_PARAMS, "Object %s not found" % params.get("id"))
+        return {"success": True, "message": "Object was successfully updated"}
+
+    def _cmdb_object_delete(self, params, headers):
+        status = STATUS_NAMES.get(params.get("status"), STATUS_DELETED)
+        try:
+            self.cmdb.delete(int(params.get("id", 0)), status)
+        except KeyError:
+            raise RpcError(ERR_INVALID_PARAMS, "Object %s not found" % params.get("id"))
+        return {"success": True, "message": "Object was successfully deleted"}
+
+    def _cmdb_category_read(self, params, headers):
+        obj_id = params.get("objID", params.get("id"))
+        if obj_id is None or "category" not in params:
+            raise RpcError(ERR_INVALID_PARAMS, "Parameters objID and category are required")
+        return self.cmdb.categories(int(obj_id)).get(params["category"], [])
+
+
+class FakeServer:
+    """HTTP server speaking the i-doit JSON-RPC wire format for a ``FakeApi``.
+
+    Each HTTP request is delayed by ``latency`` plus up to ``jitter`` seconds and fails with
+    HTTP status 502 with probability ``error_rate``.  Like PHP, the server processes the
+    requests of one session one at a time unless ``serialize_sessions`` is ``False``.
+    """
+
+    def __init__(
+        self,
+        cmdb: typing.Optional[FakeCmdb] = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        user: str = "admin",
+        password: str = "admin",
+        api_key: str = "fake-api-key",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        serialize_sessions: bool = True,
+        seed: typing.Optional[int] = None,
+    ):
+        self.cmdb = cmdb or FakeCmdb()
+        self.api = FakeApi(self.cmdb, user, password, api_key)
+        self.user = user
+        self.password = password
+        self.api_key = api_key
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.serialize_sessions = serialize_sessions
+        self.random = random.Random(seed)
+        self._session_locks: typing.Dict[str, threading.Lock] = collections.defaultdict(
+            threading.Lock
+        )
+        self._lock = threading.Lock()
+        self.httpd = _ThreadingHTTPServer((host, port), self._make_handler())
+        self._thread: typing.Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """Base URL of the server, to be passed to ``Client``."""
+        host, port = self.httpd.socket.getsockname()[:2]
+        return "http://%s:%d" % (host, port)
+
+    def start(self) -> "FakeServer":
+        """Start serving in a background thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving and close the socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args, **kwargs):
+        self.stop()
+        return False
+
+    def _session_lock(self, session_id: typing.Optional[str]) -> typing.Any:
+        if not self.serialize_sessions or not session_id:
+            return _NullContext()
+        with self._lock:
+            return self._session_locks[session_id]
+
+    def _draw_delay_and_failure(self) -> typing.Tuple[float, bool]:
+        with self._lock:
+            delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+            return delay, self.random.random() < self.error_rate
+
+    def handle(self, body: bytes, headers: typing.Any) -> typing.Tuple[int, typing.Any]:
+        """Handle a request and return the HTTP status and the JSON response."""
+        delay, fail = self._draw_delay_and_failure()
+        with self._session_lock(headers.get("X-RPC-Auth-Session")):
+            if delay:
+                time.sleep(delay)
+            if fail:
+                return 502, {"error": "Bad Gateway"}
+            try:
+                payload = json.loads(body)
+            except ValueError:
+                return 200, _error(None, ERR_INVALID_REQUEST, "Parse error")
+            if isinstance(payload, list):
+                return 200, [self._handle_call(call, headers) for call in payload]
+            return 200, self._handle_call(payload, headers)
+
+    def _handle_call(self, call: typing.Any, headers: typing.Any) -> typing.Dict[str, typing.Any]:
+        if not isinstance(call, dict) or "method" not in call:
+            return _error(None, ERR_INVALID_REQUEST, "Invalid request")
+        try:
+            result = self.api.call(call["method"], call.get("params") or {}, headers)
+        except RpcError as e:
+            return _error(call.get("id"), e.code, e.message)
+        return {"jsonrpc": "2.0", "result": result, "id": call.get("id")}
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+            # Headers and body are written separately, avoid the delayed ACK stall.
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                if self.path.split("?")[0] != "/src/jsonrpc.php":
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                status, response = server.handle(body, self.headers)
+                data = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug("fake server: " + format, *args)
+
+        return Handler
+
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class _NullContext:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+def _error(req_id: typing.Any, code: int, message: str) -> typing.Dict[str, typing.Any]:
+    return {"jsonrpc": "2.0", "error": {"code": code, "message": message}, "id": req_id}
+
+
+def main(argv=None):  # pragma: nocover
+    """Serve a synthetic CMDB until interrupted."""
+    parser = argparse.ArgumentParser(prog="python -m idoit.fakeserver")
+    parser.add_argument("--host", default="127.0.0.1", help="Host to bind to")
+    parser.add_argument("--port", type=int, default=8080, help="Port to bind to")
+    parser.add_argument("--objects", type=int, default=1000, help="Number of objects")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Rate of HTTP 502 errors")
+    parser.add_argument("--user", default="admin", help="User name to accept")
+    parser.add_argument("--password", default="admin", help="Password to accept")
+    parser.add_argument("--api-key", default="fake-api-key", help="API key to accept")
+    args = parser.parse_args(argv)
+
+    server = FakeServer(
+        FakeCmdb(args.objects),
+        host=args.host,
+        port=args.port,
+        user=args.user,
+        password=args.password,
+        api_key=args.api_key,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+    )
+    logger.info("Serving %d objects at %s", args.objects, server.url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    main()
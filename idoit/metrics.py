@@ -0,0 +1,140 @@
+"""Per-method metrics of the JSON-RPC requests sent by ``idoit.api.Client``."""
+
+import bisect
+import json
+import random
+import threading
+import typing
+
+#: Upper bounds of the latency histogram buckets in seconds (as used by Prometheus clients).
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#: The reported latency quantiles.
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class _MethodMetrics:
+    """Metrics of one JSON-RPC method."""
+
+    def __init__(self, max_samples: int):
+        self.max_samples = max_samples
+        self.count = 0
+        self.errors = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        #: Number of latencies per bucket, the last one counting those above all bounds.
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        #: Uniform sample of the latencies for computing the quantiles (reservoir sampling).
+        self.samples: typing.List[float] = []
+
+    def observe(self, latency: float, request_bytes: int, response_bytes: int, error: bool):
+        self.count += 1
+        self.errors += int(error)
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, latency)] += 1
+        if len(self.samples) < self.max_samples:
+            self.samples.append(latency)
+        else:
+            idx = random.randrange(self.count)
+            if idx < self.max_samples:
+                self.samples[idx] = latency
+
+    def quantile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        samples = sorted(self.samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+    def to_dict(self) -> typing.Dict[str, typing.Any]:
+        result: typing.Dict[str, typing.Any] = {
+            "count": self.count,
+            "errors": self.errors,
+            "latency_mean": self.latency_sum / self.count if self.count else 0.0,
+            "latency_max": self.latency_max,
+            "request_bytes": self.request_bytes,
+            "response_bytes": self.response_bytes,
+        }
+        for q in QUANTILES:
+            result["latency_p%d" % int(q * 100)] = self.quantile(q)
+        return result
+
+
+class Metrics:
+    """Collect request counts, errors, latencies, and payload sizes per JSON-RPC method.
+
+    Latency quantiles are computed from a uniform sample of at most ``max_samples``
+    latencies per method.  Thread-safe.
+    """
+
+    def __init__(self, max_samples: int = 10000):
+        self.max_samples = max_samples
+        self._methods: typing.Dict[str, _MethodMetrics] = {}
+        self._lock = threading.Lock()
+
+    def observe(
+        self,
+        method: str,
+        latency: float,
+        request_bytes: int = 0,
+        response_bytes: int = 0,
+        error: bool = False,
+    ) -> None:
+        """Record one request of ``method`` taking ``latency`` seconds."""
+        with self._lock:
+            if method not in self._methods:
+                self._methods[method] = _MethodMetrics(self.max_samples)
+            self._methods[method].observe(latency, request_bytes, response_bytes, error)
+
+    def stats(self) -> typing.Dict[str, typing.Dict[str, typing.Any]]:
+        """Return the metrics by method as nested ``dict``."""
+        with self._lock:
+            return {method: m.to_dict() for method, m in sorted(self._methods.items())}
+
+    def to_json(self) -> str:
+        """Return the metrics in JSON format."""
+        return json.dumps(self.stats(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """Return the metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def family(name, type_, help_):
+            lines.append("# HELP %s %s" % (name, help_))
+            lines.append("# TYPE %s %s" % (name, type_))
+
+        with self._lock:
+            methods = sorted(self._methods.items())
+            family("idoit_rpc_requests_total", "counter", "Number of JSON-RPC requests.")
+            for method, m in methods:
+                lines.append('idoit_rpc_requests_total{method="%s"} %d' % (method, m.count))
+            family("idoit_rpc_errors_total", "counter", "Number of failed JSON-RPC requests.")
+            for method, m in methods:
+                lines.append('idoit_rpc_errors_total{method="%s"} %d' % (method, m.errors))
+            for name, attr in (("request", "request_bytes"), ("response", "response_bytes")):
+                metric = "idoit_rpc_%s_bytes_total" % name
+                family(metric, "counter", "Size of JSON-RPC %s bodies in bytes." % name)
+                for method, m in methods:
+                    lines.append('%s{method="%s"} %d' % (metric, method, getattr(m, attr)))
+            metric = "idoit_rpc_latency_seconds"
+            family(metric, "histogram", "Latency of JSON-RPC requests in seconds.")
+            for method, m in methods:
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), m.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(
+                        '%s_bucket{method="%s",le="%s"} %d' % (metric, method, le, cumulative)
+                    )
+                lines.append('%s_sum{method="%s"} %r' % (metric, method, m.latency_sum))
+                lines.append('%s_count{method="%s"} %d' % (metric, method, m.count))
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str) -> None:
+        """Write metrics to ``path``, as JSON if it ends in ``.json``, else for Prometheus."""
+        with open(path, "wt") as outputf:
+            outputf.write(self.to_json() if path.endswith(".json") else self.to_prometheus())
@@ -0,0 +1,643 @@
+"""Local mirror of the CMDB in a SQLite database.
+
+``sync()`` copies the object types, all objects, and selected categories from the server
+into a ``Mirror``; ``LocalClient`` answers the read-only queries of the command line
+interface from the mirror rather than the server, e.g., for reporting jobs doing full
+scans over and over again.
+"""
+
+import contextlib
+import datetime
+import itertools
+import os
+import sqlite3
+import threading
+import typing
+
+from logzero import logger
+
+from . import codec, search_index
+from .api import Client, object_types_from_result
+
+#: Categories copied into the mirror by default.
+DEFAULT_CATEGORIES = ("C__CATG__GLOBAL", "C__CATG__IP", "C__CATG__MODEL")
+
+#: Record status of normal objects, the only ones returned by ``cmdb.objects.read`` by default.
+STATUS_NORMAL = 2
+
+#: Columns of the ``objects`` table that can be filtered and sorted by.
+OBJECT_COLUMNS = ("id", "type", "title", "sysid", "status", "created", "updated")
+
+
+def _parse_limit(limit: typing.Any) -> typing.Tuple[int, int]:
+    """Parse ``limit`` parameter of ``cmdb.objects.read`` into offset and count (-1 for all)."""
+    if limit is None:
+        return 0, -1
+    parts = str(limit).split(",")
+    if len(parts) == 1:
+        return 0, int(parts[0])
+    return int(parts[0]), int(parts[1])
+
+
+def _chunks(iterable: typing.Iterable, size: int) -> typing.Iterator[typing.List]:
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class Mirror:
+    """Copy of the objects and categories of a CMDB in the SQLite database at ``path``.
+
+    The objects are stored as returned by ``cmdb.objects.read`` along with indexed columns
+    for id, type, title, and sysid.  Modifications must be done within ``transaction()``;
+    concurrent readers see the previous state until the transaction is committed.
+    Thread-safe.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        #: Path to the SQLite database.
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", mode=0o700, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._lock = threading.RLock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS object_types (id INTEGER PRIMARY KEY, "
+                "const TEXT, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS objects (id INTEGER PRIMARY KEY, "
+                "type INTEGER NOT NULL, title TEXT, sysid TEXT, status INTEGER, created TEXT, "
+                "updated TEXT, generation INTEGER NOT NULL, data TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS objects_type_title ON objects (type, title)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS objects_title ON objects (title)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS objects_sysid ON objects (sysid)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS categories (obj_id INTEGER NOT NULL, "
+                "category TEXT NOT NULL, data TEXT NOT NULL, PRIMARY KEY (obj_id, category))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks (type INTEGER PRIMARY KEY, "
+                "updated TEXT NOT NULL, synced_at TEXT NOT NULL)"
+            )
+            #: Whether the full-text search index is available.
+            self.fts = search_index.create_tables(self._conn)
+
+    @contextlib.contextmanager
+    def transaction(self) -> typing.Iterator["Mirror"]:
+        """Context manager for modifying the mirror, committing on success."""
+        with self._lock, self._conn:
+            yield self
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def get_meta(self, key: str) -> typing.Optional[str]:
+        """Return metadata value for ``key``, e.g., ``server_url`` or ``synced_at``."""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row[0]
+
+    def set_meta(self, key: str, value: str) -> None:
+        self._conn.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    def clear(self) -> None:
+        """Remove all contents."""
+        for table in ("meta", "object_types", "objects", "categories", "watermarks"):
+            self._conn.execute("DELETE FROM %s" % table)
+        search_index.remove(self._conn, self.fts, None)
+
+    def _remove_orphans(self) -> None:
+        """Remove categories and search index entries of removed objects."""
+        self._conn.execute("DELETE FROM categories WHERE obj_id NOT IN (SELECT id FROM objects)")
+        rows = self._conn.execute(
+            "SELECT DISTINCT obj_id FROM search_fields WHERE obj_id NOT IN (SELECT id FROM objects)"
+        ).fetchall()
+        if rows:
+            search_index.remove(self._conn, self.fts, [obj_id for obj_id, in rows])
+
+    def put_object_types(self, object_types: typing.List[typing.Dict[str, typing.Any]]) -> None:
+        """Replace the object types by the result of ``cmdb.object_types.read``."""
+        self._conn.execute("DELETE FROM object_types")
+        self._conn.executemany(
+            "INSERT INTO object_types VALUES (?, ?, ?)",
+            ((int(t["id"]), t.get("const"), codec.dumps(t)) for t in object_types),
+        )
+
+    def get_object_types(self) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Return the object types as returned by ``cmdb.object_types.read``."""
+        with self._lock:
+            rows = self._conn.execute("SELECT data FROM object_types ORDER BY id").fetchall()
+        return [codec.loads(data) for data, in rows]
+
+    def put_objects(self, objs: typing.Iterable[typing.Dict[str, typing.Any]], generation: int):
+        """Insert or replace objects as returned by ``cmdb.objects.read``.
+
+        ``generation`` identifies the sync, see ``remove_stale()``.
+        """
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    int(obj["id"]),
+                    int(obj["type"]),
+                    obj.get("title"),
+                    obj.get("sysid"),
+                    int(obj.get("status") or STATUS_NORMAL),
+                    obj.get("created"),
+                    obj.get("updated"),
+                    generation,
+                    codec.dumps(obj),
+                )
+                for obj in objs
+            ),
+        )
+
+    def stale_ids(self, generation: int) -> typing.List[int]:
+        """Return the ids of the objects not seen in sync ``generation``."""
+        rows = self._conn.execute("SELECT id FROM objects WHERE generation < ?", (generation,))
+        return [obj_id for obj_id, in rows]
+
+    def remove_stale(self, generation: int) -> int:
+        """Remove objects not seen in sync ``generation`` and return their number."""
+        count = self._conn.execute(
+            "DELETE FROM objects WHERE generation < ?", (generation,)
+        ).rowcount
+        self._remove_orphans()
+        return count
+
+    def get_watermarks(self) -> typing.Dict[int, str]:
+        """Return the newest ``updated`` timestamp synced by object type."""
+        with self._lock:
+            return dict(self._conn.execute("SELECT type, updated FROM watermarks").fetchall())
+
+    def set_watermark(self, type_id: int, updated: str) -> None:
+        self._conn.execute(
+            "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+            (type_id, updated, datetime.datetime.now().isoformat()),
+        )
+
+    def clear_watermarks(self) -> None:
+        self._conn.execute("DELETE FROM watermarks")
+
+    def count_objects(self, type_id: int) -> int:
+        """Return the number of normal objects of the given type."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM objects WHERE type = ? AND status = ?",
+                (type_id, STATUS_NORMAL),
+            ).fetchone()[0]
+
+    def object_ids(self, type_id: int) -> typing.Set[int]:
+        """Return the ids of the objects of the given type."""
+        rows = self._conn.execute("SELECT id FROM objects WHERE type = ?", (type_id,))
+        return {obj_id for obj_id, in rows}
+
+    def remove_objects_except(self, type_id: int, obj_ids: typing.Set[int]) -> int:
+        """Remove the objects of the given type not in ``obj_ids`` and return their number."""
+        rows = self._conn.execute("SELECT id FROM objects WHERE type = ?", (type_id,))
+        stale = [(obj_id,) for obj_id, in rows.fetchall() if obj_id not in obj_ids]
+        self._conn.executemany("DELETE FROM objects WHERE id = ?", stale)
+        self._remove_orphans()
+        return len(stale)
+
+    def remove_objects_of_other_types(self, type_ids: typing.List[int]) -> int:
+        """Remove the objects whose type is not in ``type_ids`` and return their number."""
+        count = self._conn.execute(
+            "DELETE FROM objects WHERE type NOT IN (%s)" % ", ".join("?" * len(type_ids)),
+            type_ids,
+        ).rowcount
+        self._remove_orphans()
+        return count
+
+    def put_categories(
+        self, obj_id: int, category: str, entries: typing.List[typing.Dict[str, typing.Any]]
+    ) -> None:
+        """Store the entries of ``category`` of an object as returned by ``cmdb.category.read``."""
+        self._conn.execute(
+            "INSERT OR REPLACE INTO categories VALUES (?, ?, ?)",
+            (int(obj_id), category, codec.dumps(entries)),
+        )
+
+    def get_categories(
+        self, obj_id: int, category: str
+    ) -> typing.Optional[typing.List[typing.Dict[str, typing.Any]]]:
+        """Return the entries of ``category`` of an object or ``None`` if not mirrored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM categories WHERE obj_id = ? AND category = ?",
+                (int(obj_id), category),
+            ).fetchone()
+        return None if row is None else codec.loads(row[0])
+
+    def refresh_search_index(self, obj_ids: typing.Optional[typing.List[int]] = None) -> None:
+        """Rebuild the search index entries of the objects with ``obj_ids`` (all if ``None``)."""
+        search_index.remove(self._conn, self.fts, obj_ids)
+        for obj_id, fields in search_index.iter_object_fields(self._conn, obj_ids):
+            search_index.add(self._conn, self.fts, obj_id, fields)
+
+    def search(
+        self, query: str, *, limit: int = 100, fuzzy: bool = True
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Return the best matching fields for ``query``, see ``idoit.search_index.search()``."""
+        with self._lock:
+            has_index = self._conn.execute("SELECT 1 FROM search_fields LIMIT 1").fetchone()
+            if not has_index and self._conn.execute("SELECT 1 FROM objects LIMIT 1").fetchone():
+                logger.info("Building search index of mirror %s", self.path)
+                with self.transaction():
+                    self.refresh_search_index()
+            return search_index.search(self._conn, self.fts, query, limit=limit, fuzzy=fuzzy)
+
+    def get_object(self, obj_id: int) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        """Return the object with the given id as returned by ``cmdb.objects.read``."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM objects WHERE id = ?", (int(obj_id),)
+            ).fetchone()
+        return None if row is None else codec.loads(row[0])
+
+    def query_objects(
+        self,
+        filter: typing.Optional[typing.Dict[str, typing.Any]] = None,
+        order_by: typing.Optional[str] = None,
+        sort: str = "ASC",
+        limit: typing.Any = None,
+    ) -> typing.List[typing.Dict[str, typing.Any]]:
+        """Return objects like ``cmdb.objects.read`` with the given parameters.
+
+        The filter supports ``ids``, ``type`` (id or constant), ``title``, ``sysid``, and
+        ``status`` (normal objects by default).
+        """
+        filter = filter or {}
+        where = ["status = ?"]
+        values: typing.List[typing.Any] = [int(filter.get("status", STATUS_NORMAL))]
+        if filter.get("ids") is not None:
+            ids = [int(obj_id) for obj_id in filter["ids"]]
+            where.append("id IN (%s)" % ", ".join("?" * len(ids)))
+            values += ids
+        if "type" in filter:
+            type_ = filter["type"]
+            if isinstance(type_, str) and not type_.isdigit():
+                where.append("type = (SELECT id FROM object_types WHERE const = ?)")
+                values.append(type_)
+            else:
+                where.append("type = ?")
+                values.append(int(type_))
+        for column in ("title", "sysid"):
+            if column in filter:
+                where.append("%s = ?" % column)
+                values.append(filter[column])
+        sql = "SELECT data FROM objects WHERE %s" % " AND ".join(where)
+        if order_by:
+            direction = "DESC" if str(sort).upper() == "DESC" else "ASC"
+            if order_by in OBJECT_COLUMNS:
+                sql += " ORDER BY %s %s" % (order_by, direction)
+            else:
+                sql += " ORDER BY json_extract(data, ?) %s" % direction
+                values.append("$." + order_by)
+        offset, count = _parse_limit(limit)
+        sql += " LIMIT ? OFFSET ?"
+        values += [count, offset]
+        with self._lock:
+            rows = self._conn.execute(sql, values).fetchall()
+        return [codec.loads(data) for data, in rows]
+
+    def stats(self) -> typing.Dict[str, typing.Any]:
+        """Return numbers of object types, objects, category entries, and indexed fields, and
+        sync metadata."""
+        with self._lock:
+            result: typing.Dict[str, typing.Any] = {
+                table: self._conn.execute("SELECT COUNT(*) FROM %s" % table).fetchone()[0]
+                for table in ("object_types", "objects", "categories", "search_fields")
+            }
+            result.update(self._conn.execute("SELECT key, value FROM meta").fetchall())
+            result["watermarks"] = dict(
+                self._conn.execute("SELECT type, updated FROM watermarks").fetchall()
+            )
+        return result
+
+
+def _sync_categories(
+    client: Client,
+    mirror: Mirror,
+    obj_ids: typing.Iterable[int],
+    categories: typing.Sequence[str],
+    batch_size: int,
+    concurrency: int,
+    counts: typing.Dict[str, int],
+) -> None:
+    """Fetch the ``categories`` of the objects with ``obj_ids`` into ``mirror``."""
+    if not categories:
+        return
+    # Fetch the categories of several batches at once to keep all workers busy.
+    for chunk in _chunks(obj_ids, batch_size * concurrency):
+        calls = [
+            ("cmdb.category.read", {"objID": obj_id, "category": category})
+            for obj_id in chunk
+            for category in categories
+        ]
+        responses = client.query_many(calls, batch_size=batch_size, concurrency=concurrency)
+        for (_, params), response in zip(calls, responses):
+            if "error" in response:
+                logger.warning(
+                    "Could not read %s of object %s: %s",
+                    params["category"],
+                    params["objID"],
+                    response["error"],
+                )
+                counts["errors"] += 1
+                continue
+            mirror.put_categories(params["objID"], params["category"], response["result"])
+            counts["categories"] += 1
+
+
+def _finish_sync(client: Client, mirror: Mirror, version: str, generation: int) -> None:
+    mirror.set_meta("server_url", client.server_url)
+    mirror.set_meta("version", version)
+    mirror.set_meta("generation", str(generation))
+    mirror.set_meta("synced_at", datetime.datetime.now().isoformat())
+
+
+def sync(
+    client: Client,
+    mirror: Mirror,
+    *,
+    categories: typing.Sequence[str] = DEFAULT_CATEGORIES,
+    page_size: int = 1000,
+    batch_size: int = 100,
+    concurrency: int = 4
+) -> typing.Dict[str, int]:
+    """Copy object types, objects, and ``categories`` from the server into ``mirror``.
+
+    The objects are fetched in pages of ``page_size``, the categories in JSON-RPC batches
+    of ``batch_size`` calls with up to ``concurrency`` batches in flight.  Objects that are
+    no longer returned by the server are removed.  All changes are committed at once at
+    the end.  Return the numbers of synced objects and category entries, of removed
+    objects, and of failed category reads.
+    """
+    counts = {"objects": 0, "categories": 0, "removed": 0, "errors": 0}
+    version = client.query_version()
+    object_types = client.query("cmdb.object_types.read")["result"]
+    with mirror.transaction():
+        if mirror.get_meta("server_url") not in (None, client.server_url):
+            logger.warning("Mirror %s was synced from another server, replacing", mirror.path)
+            mirror.clear()
+        generation = int(mirror.get_meta("generation") or 0) + 1
+        mirror.put_object_types(object_types)
+
+        obj_ids = []
+        watermarks: typing.Dict[int, str] = {}
+
+        def put(page):
+            mirror.put_objects(page, generation)
+            for obj in page:
+                obj_ids.append(int(obj["id"]))
+                type_id, updated = int(obj["type"]), obj.get("updated") or ""
+                watermarks[type_id] = max(watermarks.get(type_id, ""), updated)
+            counts["objects"] += len(page)
+            logger.debug("Synced %d objects", counts["objects"])
+
+        # Paging by id, so objects created during the sync are appended to the last page.
+        for page in _chunks(client.iter_objects(order_by="id", page_size=page_size), page_size):
+            put(page)
+        # Objects deleted during the sync shift the later pages, so objects that were not
+        # seen may still exist.
+        for chunk in _chunks(mirror.stale_ids(generation), page_size):
+            put(client.query("cmdb.objects.read", {"filter": {"ids": chunk}})["result"])
+        counts["removed"] = mirror.remove_stale(generation)
+        mirror.clear_watermarks()
+        for object_type in object_types:
+            type_id = int(object_type["id"])
+            mirror.set_watermark(type_id, watermarks.get(type_id, ""))
+
+        _sync_categories(client, mirror, obj_ids, categories, batch_size, concurrency, counts)
+        mirror.refresh_search_index()
+        _finish_sync(client, mirror, version, generation)
+    return counts
+
+
+def sync_incremental(
+    client: Client,
+    mirror: Mirror,
+    *,
+    categories: typing.Sequence[str] = DEFAULT_CATEGORIES,
+    page_size: int = 1000,
+    batch_size: int = 100,
+    concurrency: int = 4
+) -> typing.Dict[str, int]:
+    """Update ``mirror`` with the objects modified since the last sync.
+
+    For each object type, the objects are fetched ordered by their ``updated`` timestamp,
+    newest first, until reaching the watermark recorded by the last sync; only the
+    ``categories`` of these objects are fetched again.  Deleted and archived objects are
+    detected by comparing the number of objects per type reported by
+    ``cmdb.object_types.read`` to the mirror; only the object types with differing counts
+    are fetched completely, adding the objects missing from the mirror.  Types without
+    watermark are fetched completely as well.  Falls back to ``sync()`` if the mirror was
+    not synced from the server before.  Return the same counts as ``sync()`` plus the number
+    of ``rescanned`` object types.
+    """
+    if mirror.get_meta("server_url") != client.server_url:
+        logger.info("Mirror %s not synced from %s yet, syncing all", mirror.path, client.server_url)
+        return sync(
+            client,
+            mirror,
+            categories=categories,
+            page_size=page_size,
+            batch_size=batch_size,
+            concurrency=concurrency,
+        )
+
+    counts = {"objects": 0, "categories": 0, "removed": 0, "errors": 0, "rescanned": 0}
+    version = client.query_version()
+    object_types = client.query("cmdb.object_types.read", {"countobjects": True})["result"]
+    with mirror.transaction():
+        generation = int(mirror.get_meta("generation") or 0)
+        watermarks = mirror.get_watermarks()
+        mirror.put_object_types(object_types)
+        type_ids = [int(object_type["id"]) for object_type in object_types]
+        counts["removed"] += mirror.remove_objects_of_other_types(type_ids)
+
+        changed = []
+        for type_id in type_ids:
+            watermark = watermarks.get(type_id)
+            newest = watermark or ""
+            objs = client.iter_objects(
+                filter={"type": type_id},
+                order_by="updated",
+                sort="DESC",
+                page_size=page_size,
+                prefetch=False,
+            )
+            for page in _chunks(objs, page_size):
+                if watermark is not None:
+                    page = [obj for obj in page if (obj.get("updated") or "") >= watermark]
+                mirror.put_objects(page, generation)
+                changed += [int(obj["id"]) for obj in page]
+                counts["objects"] += len(page)
+                newest = max([newest] + [obj.get("updated") or "" for obj in page])
+                if len(page) < page_size:  # reached the watermark or the last page
+                    break
+            mirror.set_watermark(type_id, newest)
+        logger.debug("Found %d modified objects", len(changed))
+
+        for object_type in object_types:
+            type_id = int(object_type["id"])
+            server_count = object_type.get("objectcount")
+            if server_count is not None and int(server_count) == mirror.count_objects(type_id):
+                continue
+            logger.debug("Object counts of type %d differ, fetching all objects", type_id)
+            counts["rescanned"] += 1
+            known = mirror.object_ids(type_id)
+            obj_ids: typing.Set[int] = set()
+            objs = client.iter_objects(filter={"type": type_id}, order_by="id", page_size=page_size)
+            for page in _chunks(objs, page_size):
+                # e.g., restored objects whose timestamp is older than the watermark
+                missing = [obj for obj in page if int(obj["id"]) not in known]
+                mirror.put_objects(missing, generation)
+                changed += [int(obj["id"]) for obj in missing]
+                counts["objects"] += len(missing)
+                obj_ids.update(int(obj["id"]) for obj in page)
+            counts["removed"] += mirror.remove_objects_except(type_id, obj_ids)
+
+        _sync_categories(client, mirror, changed, categories, batch_size, concurrency, counts)
+        mirror.refresh_search_index(changed)
+        _finish_sync(client, mirror, version, generation)
+    return counts
+
+
+class LocalClient:
+    """Answer read-only queries from a ``Mirror`` instead of the server.
+
+    Provides the parts of the ``idoit.api.Client`` interface used by the command line
+    interface.  Calls of other methods, in particular writing ones, raise an exception.
+    """
+
+    def __init__(self, mirror: Mirror):
+        self.mirror = mirror
+        self._object_types: typing.Optional[typing.Dict[int, str]] = None
+        self._req_no = itertools.count(1)
+        self._methods = {
+            "idoit.version": self._idoit_version,
+            "idoit.search": self._idoit_search,
+            "cmdb.object_types.read": self._cmdb_object_types_read,
+            "cmdb.objects.read": self._cmdb_objects_read,
+            "cmdb.object.read": self._cmdb_object_read,
+            "cmdb.object": self._cmdb_object_read,
+            "cmdb.category.read": self._cmdb_category_read,
+        }
+
+    @property
+    def server_url(self) -> typing.Optional[str]:
+        return self.mirror.get_meta("server_url")
+
+    def __enter__(self):
+        if self.mirror.get_meta("synced_at") is None:
+            raise Exception("Local mirror %s is empty, run sync first" % self.mirror.path)
+        logger.info(
+            "Using local mirror of %s from %s", self.server_url, self.mirror.get_meta("synced_at")
+        )
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.mirror.close()
+        return False
+
+    @property
+    def object_types(self) -> typing.Dict[int, str]:
+        """Mapping from object type number to object type name."""
+        if self._object_types is None:
+            self._object_types = object_types_from_result(self.mirror.get_object_types())
+        return self._object_types
+
+    def query_version(self):
+        """Return the server version at the time of the sync."""
+        return self.mirror.get_meta("version")
+
+    def query(self, command, params=None):
+        impl = self._methods.get(command)
+        if impl is None:
+            raise Exception("Method %s is not available in the local mirror" % command)
+        return {"jsonrpc": "2.0", "result": impl(params or {}), "id": next(self._req_no)}
+
+    def map(self, command, params_iter, *, concurrency=8):
+        """Run ``command`` once for each params in ``params_iter``, like ``Client.map()``."""
+        for params in params_iter:
+            try:
+                yield self.query(command, params)
+            except Exception as e:
+                yield e
+
+    def map_batches(self, command, params_iter, *, batch_size=100, concurrency=4):
+        """Run ``command`` for each params in ``params_iter``, like ``Client.map_batches()``."""
+        return self.map(command, params_iter)
+
+    def iter_objects(self, filter=None, order_by=None, *, sort=None, page_size=1000, prefetch=True):
+        """Yield the objects like ``Client.iter_objects()``."""
+        yield from self.mirror.query_objects(filter, order_by, sort or "ASC")
+
+    def _idoit_version(self, params):
+        return {"version": self.query_version(), "type": "MIRROR"}
+
+    def _idoit_search(self, params):
+        term = str(params.get("q", ""))
+        if not term.strip():
+            raise Exception("Parameter q is missing")
+        result = []
+        type_titles: typing.Dict[int, str] = {}
+        for hit in self.mirror.search(term, limit=int(params.get("limit", 100))):
+            obj_id = hit["obj_id"]
+            if obj_id not in type_titles:
+                type_titles[obj_id] = (self.mirror.get_object(obj_id) or {}).get("type_title", "")
+            result.append(
+                {
+                    "documentId": str(obj_id),
+                    "key": "%s > %s" % (type_titles[obj_id], hit["field"]),
+                    "value": hit["value"],
+                    "type": "cmdb",
+                    "link": "/?objID=%d" % obj_id,
+                    "score": round(hit["score"], 3),
+                }
+            )
+        return result
+
+    def _cmdb_object_types_read(self, params):
+        return self.mirror.get_object_types()
+
+    def _cmdb_objects_read(self, params):
+        return self.mirror.query_objects(
+            params.get("filter"),
+            params.get("order_by"),
+            params.get("sort", "ASC"),
+            params.get("limit"),
+        )
+
+    def _cmdb_object_read(self, params):
+        obj = self.mirror.get_object(params.get("id", 0))
+        if obj is None:
+            return []
+        result = {k: v for k, v in obj.items() if k not in ("type", "type_group_title")}
+        result["objecttype"] = obj["type"]
+        result["type_icon"] = obj.get("image")
+        return result
+
+    def _cmdb_category_read(self, params):
+        obj_id = params.get("objID", params.get("id"))
+        entries = self.mirror.get_categories(obj_id, params.get("category"))
+        if entries is None:
+            raise Exception(
+                "Category %s of object %s is not in the local mirror"
+                % (params.get("category"), obj_id)
+            )
+        return entries
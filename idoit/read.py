@@ -1,27 +1,125 @@
-"""Implementation of ``idoit-cli search`` command.
+"""Implementation of ``idoit-cli read`` command.
 
-Lists the constants.
+Reads objects by id.  The ids are given as arguments, as ranges like ``1000-2000``, or one
+per line from stdin (``-``) or a file (``--from-file``).  They are read lazily and fetched
+in batches, so arbitrarily many ids can be piped in with constant memory.
 """
 
 import argparse
-import json
+import collections
+import itertools
+import sys
+import typing
 
+from logzero import logger
 from pygments import highlight
 from pygments.lexers import PythonLexer
 from pygments.formatters import Terminal256Formatter
 
-from .api import Client
+from . import codec
+from .common import add_local_argument, make_client
+
+
+def parse_ids(spec: str) -> typing.Iterable[int]:
+    """Return the ids given by ``spec``, a single id or an inclusive range ``first-last``.
+
+    Raises ``ValueError`` for malformed specs.
+    """
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return [int(first)]
+    if int(first) > int(last):
+        raise ValueError("empty range %r" % spec)
+    return range(int(first), int(last) + 1)
+
+
+def iter_lines_ids(path: str) -> typing.Iterator[int]:
+    """Yield the ids given one per line in the file at ``path`` (stdin for ``-``).
+
+    Empty lines and ``#`` comments are skipped, invalid lines are logged and skipped.
+    """
+    if path != "-":
+        with open(path, "rt") as inputf:
+            yield from _parse_lines(inputf, path)
+    else:
+        yield from _parse_lines(sys.stdin, "stdin")
+
+
+def _parse_lines(lines: typing.Iterable[str], name: str) -> typing.Iterator[int]:
+    for lineno, line in enumerate(lines, 1):
+        if not line.strip() or line.lstrip().startswith("#"):
+            continue
+        try:
+            yield from parse_ids(line)
+        except ValueError:
+            logger.error("Ignoring invalid id in %s line %d: %r", name, lineno, line.strip())
+
+
+def iter_ids(specs: typing.Iterable[str]) -> typing.Iterator[int]:
+    """Yield the ids of the ``specs`` from the command line, reading stdin for ``-``."""
+    for spec in specs:
+        yield from iter_lines_ids(spec) if spec == "-" else parse_ids(spec)
 
 
 def setup_argparse(parser: argparse.ArgumentParser) -> None:
     """Main entry point for subcommand."""
 
-    parser.add_argument("ids", nargs="+", help="Search term(s)")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=100,
+        help="Number of objects to retrieve per batch request, default: %(default)s",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-j",
+        type=int,
+        default=4,
+        help="Number of batch requests to send in parallel, default: %(default)s",
+    )
+    parser.add_argument(
+        "--from-file",
+        metavar="PATH",
+        help="Read ids or ranges from file, one per line ('-' for stdin)",
+    )
+    add_local_argument(parser)
+    parser.add_argument(
+        "ids", nargs="*", help="Object id(s), ranges like 1000-2000, or '-' to read from stdin"
+    )
 
 
 def run(args, parser, subparser):
-    """Main entry point for constants command."""
-    with Client(args.idoit_url, args.idoit_user, args.idoit_password, args.idoit_api_key) as client:
-        for obj_id in args.ids:
-            result = client.query("cmdb.object.read", params={"id": obj_id})
-            print(highlight(json.dumps(result, indent=2), PythonLexer(), Terminal256Formatter()))
+    """Main entry point for read command."""
+    if not args.ids and not args.from_file:
+        subparser.error("no ids given")
+    for spec in args.ids:
+        if spec != "-":
+            try:
+                parse_ids(spec)
+            except ValueError:
+                subparser.error("invalid id or range: %r" % spec)
+
+    ids = iter_ids(args.ids)
+    if args.from_file:
+        ids = itertools.chain(ids, iter_lines_ids(args.from_file))
+    # The ids of the requests in flight, bounded by the window of ``map_batches()``.
+    pending: typing.Deque[int] = collections.deque()
+
+    def params():
+        for obj_id in ids:
+            pending.append(obj_id)
+            yield {"id": obj_id}
+
+    with make_client(args) as client:
+        results = client.map_batches(
+            "cmdb.object.read", params(), batch_size=args.chunk_size, concurrency=args.concurrency
+        )
+        for result in results:
+            obj_id = pending.popleft()
+            if isinstance(result, Exception):
+                logger.error("Could not read object %s: %s", obj_id, result)
+                continue
+            print(
+                highlight(codec.dumps(result, indent=2), PythonLexer(), Terminal256Formatter()),
+                flush=True,
+            )
@@ -0,0 +1,175 @@
+"""Recording and replaying the JSON-RPC traffic of ``idoit.api.Client``.
+
+A ``Recorder`` writes each request and its response as one line of JSON (NDJSON) with the
+start time and duration.  A ``ReplayAdapter`` mounted into the client answers requests
+from such a file without a server, e.g., to profile the client-side overhead of a
+recorded shell session or to test changes against realistic traffic::
+
+    with Client(url, user, password, api_key, recorder=Recorder("session.ndjson")):
+        ...
+
+    with Client(url, user, password, api_key, adapter=ReplayAdapter("session.ndjson")):
+        ...
+"""
+
+import collections
+import http.client
+import os
+import threading
+import time
+import typing
+
+import requests
+from requests.adapters import BaseAdapter
+
+from . import codec
+from .caching import cache_key
+
+
+def _strip_api_key(payload: typing.Any) -> typing.Any:
+    """Return copy of JSON-RPC request ``payload`` without the API key."""
+    if isinstance(payload, list):
+        return [_strip_api_key(call) for call in payload]
+    params = {k: v for k, v in (payload.get("params") or {}).items() if k != "apikey"}
+    return {**payload, "params": params}
+
+
+def request_key(payload: typing.Any) -> str:
+    """Return key identifying the JSON-RPC request ``payload`` regardless of ids and API key."""
+    calls = payload if isinstance(payload, list) else [payload]
+    keys = [cache_key(call["method"], _strip_api_key(call)["params"]) for call in calls]
+    return "\n".join(keys) if isinstance(payload, list) else keys[0]
+
+
+class Recorder:
+    """Append JSON-RPC requests and responses to the NDJSON file at ``path``.
+
+    Each line holds the ``request`` (without the API key), the decoded ``response`` (or
+    ``null`` if the HTTP request failed), the HTTP ``status`` (``null`` if no response was
+    received), the ``timestamp`` of the start of the request in seconds since the epoch,
+    its ``duration`` in seconds, and the sizes of the bodies.  The file is only accessible
+    by the current user as the responses contain session ids.  Thread-safe.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o600)
+        self._file = os.fdopen(fd, "at")
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        request: typing.Any,
+        response: typing.Any,
+        *,
+        status: typing.Optional[int],
+        timestamp: float,
+        duration: float,
+        request_bytes: int = 0,
+        response_bytes: int = 0
+    ) -> None:
+        """Write one request/response pair."""
+        line = codec.dumps(
+            {
+                "timestamp": timestamp,
+                "duration": duration,
+                "status": status,
+                "request_bytes": request_bytes,
+                "response_bytes": response_bytes,
+                "request": _strip_api_key(request),
+                "response": response,
+            }
+        )
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        self.close()
+        return False
+
+
+def load_recording(path: str) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Return the entries of the NDJSON recording at ``path``."""
+    with open(path, "rb") as inputf:
+        return [codec.loads(line) for line in inputf if line.strip()]
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transport adapter for ``requests`` answering from a ``Recorder`` file.
+
+    Requests are matched to recorded ones by method and parameters, ignoring the request
+    ids, the API key, and all headers.  Identical requests get the recorded responses in
+    the recorded order, the last one being repeated once all have been served; the ids in
+    the responses are rewritten to match the request.  Unknown requests get HTTP status
+    404 and recorded failures are reproduced, connection errors as
+    ``requests.ConnectionError``.
+
+    With ``realtime``, each response is delayed by the recorded duration times
+    ``speed``.  Thread-safe.
+    """
+
+    def __init__(self, path: str, *, realtime: bool = False, speed: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.realtime = realtime
+        self.speed = speed
+        self._entries: typing.Dict[str, typing.Deque[typing.Dict[str, typing.Any]]] = (
+            collections.defaultdict(collections.deque)
+        )
+        for entry in load_recording(path):
+            self._entries[request_key(entry["request"])].append(entry)
+        self._lock = threading.Lock()
+
+    def _next_entry(self, key: str) -> typing.Optional[typing.Dict[str, typing.Any]]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                return None
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def send(self, request, **kwargs):
+        payload = codec.loads(request.body)
+        entry = self._next_entry(request_key(payload))
+        if entry is not None and self.realtime:
+            time.sleep(entry["duration"] * self.speed)
+
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        response.headers["Content-Type"] = "application/json"
+        if entry is None:
+            response.status_code, response.reason = 404, "Not recorded"
+            response._content = b""
+        elif entry["status"] is None:
+            raise requests.ConnectionError("Recorded connection failure", request=request)
+        else:
+            response.status_code = entry["status"]
+            response.reason = http.client.responses.get(entry["status"], "")
+            body = entry["response"]
+            if body is not None:
+                body = self._rewrite_ids(entry["request"], payload, body)
+            response._content = b"" if body is None else codec.dumps_bytes(body)
+        response._content_consumed = True  # also for ``iter_content()`` of streaming requests
+        return response
+
+    @staticmethod
+    def _rewrite_ids(recorded: typing.Any, payload: typing.Any, body: typing.Any) -> typing.Any:
+        if not isinstance(payload, list):
+            recorded, payload = [recorded], [payload]
+        ids = {old.get("id"): new.get("id") for old, new in zip(recorded, payload)}
+
+        def rewrite(res):
+            return {**res, "id": ids.get(res.get("id"), res.get("id"))}
+
+        return [rewrite(res) for res in body] if isinstance(body, list) else rewrite(body)
+
+    def close(self):
+        pass
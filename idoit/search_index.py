@@ -0,0 +1,240 @@
+"""Full-text search index of the objects in the local mirror.
+
+Each searchable value of an object (title, sysid, and the string fields of the mirrored
+categories such as hostnames, IP addresses, and serial numbers) is stored as one row of
+``search_fields`` and indexed with SQLite's FTS5 extension.  Queries match words by prefix;
+words not in the vocabulary are replaced by similar ones (fuzzy matching).  Used by
+``idoit.mirror.Mirror``.
+"""
+
+import difflib
+import re
+import sqlite3
+import typing
+
+from logzero import logger
+
+from . import codec
+
+#: Label of the title and sysid fields.
+TITLE_FIELD, SYSID_FIELD = "Global > Title", "Global > SYS-ID"
+
+#: Ranking weights of the fields, all others have weight 1.
+FIELD_WEIGHTS = {TITLE_FIELD: 3.0, SYSID_FIELD: 2.0}
+
+#: Fields of the category entries that are not indexed.
+SKIPPED_KEYS = ("id", "objID")
+
+#: Maximal number of vocabulary words compared to a misspelled word.
+MAX_FUZZY_CANDIDATES = 20000
+
+#: Words as split by FTS5's default ``unicode61`` tokenizer (approximately).
+_WORD_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+
+def create_tables(conn: sqlite3.Connection) -> bool:
+    """Create the index tables if necessary and return whether FTS5 is available.
+
+    Without FTS5, the values are still stored and searched for by substring.
+    """
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS search_fields (id INTEGER PRIMARY KEY, "
+        "obj_id INTEGER NOT NULL, field TEXT NOT NULL, value TEXT NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS search_fields_obj_id ON search_fields (obj_id)")
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+            "value, content='search_fields', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_vocab USING fts5vocab(search_index, 'row')"
+        )
+    except sqlite3.OperationalError as e:
+        logger.warning("SQLite lacks FTS5 (%s), using slow substring search", e)
+        return False
+    return True
+
+
+def object_fields(
+    obj: typing.Dict[str, typing.Any],
+    categories: typing.Iterable[typing.Tuple[str, typing.List[typing.Dict[str, typing.Any]]]],
+) -> typing.List[typing.Tuple[str, str]]:
+    """Return the searchable ``(field, value)`` pairs of ``obj`` and its category entries."""
+    result = []
+    seen = set()
+
+    def add(field, value):
+        if isinstance(value, dict):  # references to other objects or dialog entries
+            value = value.get("title")
+        if isinstance(value, str) and value.strip() and value not in seen:
+            seen.add(value)
+            result.append((field, value))
+
+    add(TITLE_FIELD, obj.get("title"))
+    add(SYSID_FIELD, obj.get("sysid"))
+    for category, entries in categories:
+        for entry in entries if isinstance(entries, list) else [entries]:
+            for key, value in entry.items():
+                if key not in SKIPPED_KEYS:
+                    add("%s > %s" % (category, key), value)
+    return result
+
+
+def remove(conn: sqlite3.Connection, fts: bool, obj_ids: typing.Optional[typing.List[int]]):
+    """Remove the objects with ``obj_ids`` (all if ``None``) from the index."""
+    if obj_ids is None:
+        conn.execute("DELETE FROM search_fields")
+        if fts:
+            conn.execute("INSERT INTO search_index (search_index) VALUES ('delete-all')")
+        return
+    for start in range(0, len(obj_ids), 500):
+        chunk = obj_ids[start : start + 500]
+        where = "obj_id IN (%s)" % ", ".join("?" * len(chunk))
+        if fts:
+            conn.execute(
+                "INSERT INTO search_index (search_index, rowid, value) "
+                "SELECT 'delete', id, value FROM search_fields WHERE " + where,
+                chunk,
+            )
+        conn.execute("DELETE FROM search_fields WHERE " + where, chunk)
+
+
+def add(
+    conn: sqlite3.Connection,
+    fts: bool,
+    obj_id: int,
+    fields: typing.List[typing.Tuple[str, str]],
+) -> None:
+    """Add the ``(field, value)`` pairs of an object to the index."""
+    for field, value in fields:
+        rowid = conn.execute(
+            "INSERT INTO search_fields (obj_id, field, value) VALUES (?, ?, ?)",
+            (obj_id, field, value),
+        ).lastrowid
+        if fts:
+            conn.execute("INSERT INTO search_index (rowid, value) VALUES (?, ?)", (rowid, value))
+
+
+def _quote(word: str) -> str:
+    return '"%s"' % word.replace('"', '""')
+
+
+def _similar_words(conn: sqlite3.Connection, word: str) -> typing.List[str]:
+    """Return words of the vocabulary similar to ``word``, sharing its first character."""
+    rows = conn.execute(
+        "SELECT term FROM search_vocab WHERE term >= ? AND term < ? "
+        "AND length(term) BETWEEN ? AND ? LIMIT ?",
+        (word[0], chr(ord(word[0]) + 1), len(word) - 2, len(word) + 2, MAX_FUZZY_CANDIDATES),
+    ).fetchall()
+    return difflib.get_close_matches(word, [term for term, in rows], n=3, cutoff=0.75)
+
+
+def _fuzzy_expression(conn: sqlite3.Connection, term: str) -> typing.Optional[str]:
+    """Return FTS5 expression matching ``term`` with misspelled words replaced."""
+    alternatives = []
+    for word in _WORD_RE.findall(term.lower()):
+        known = conn.execute("SELECT 1 FROM search_vocab WHERE term = ?", (word,)).fetchone()
+        words = [word] if known else _similar_words(conn, word)
+        if not words:
+            return None
+        alternatives.append("(%s)" % " OR ".join(_quote(w) for w in words))
+    return " AND ".join(alternatives) or None
+
+
+def _match(
+    conn: sqlite3.Connection, fts: bool, term: str, fuzzy: bool
+) -> typing.Dict[int, typing.List[typing.Tuple[float, str, str]]]:
+    """Return the ``(score, field, value)`` of the rows matching ``term`` by object id."""
+    if fts:
+        # The words of the term must follow each other, the last one may be a prefix.
+        words = _WORD_RE.findall(term)
+        if not words:
+            return {}
+        # Pairs of expression and score factor, ``None`` for the fuzzy expression built on demand.
+        queries: typing.List[typing.Tuple[typing.Optional[str], float]] = [
+            (" + ".join(_quote(w) for w in words) + " *", 1.0)
+        ]
+        if fuzzy:
+            queries.append((None, 0.5))
+        sql = (
+            "SELECT f.obj_id, f.field, f.value, bm25(search_index) FROM search_index "
+            "JOIN search_fields AS f ON f.id = search_index.rowid WHERE search_index MATCH ?"
+        )
+    else:
+        queries = [("%" + term + "%", 1.0)]
+        sql = "SELECT obj_id, field, value, 0.0 FROM search_fields WHERE value LIKE ?"
+
+    result: typing.Dict[int, typing.List[typing.Tuple[float, str, str]]] = {}
+    for expression, factor in queries:
+        if expression is None:  # fall back to fuzzy matching only without exact matches
+            if result:
+                break
+            expression = _fuzzy_expression(conn, term)
+            if expression is None:
+                break
+        for obj_id, field, value, rank in conn.execute(sql, (expression,)):
+            # bm25() is negative, the better the match the smaller.
+            score = (1.0 - rank) * FIELD_WEIGHTS.get(field, 1.0) * factor
+            if value.lower() == term.lower():
+                score *= 2.0
+            result.setdefault(obj_id, []).append((score, field, value))
+    return result
+
+
+def search(
+    conn: sqlite3.Connection, fts: bool, query: str, *, limit: int = 100, fuzzy: bool = True
+) -> typing.List[typing.Dict[str, typing.Any]]:
+    """Return the best matches for ``query``.
+
+    Objects must match all whitespace-separated terms of the query and are ranked by the
+    sum of the best score of each term.  Return up to ``limit`` matching ``(obj_id, field,
+    value, score)`` rows as ``dict`` in order of the object's and the row's score.
+    """
+    terms = query.split()
+    matches: typing.Optional[typing.Dict[int, typing.List]] = None
+    totals: typing.Dict[int, float] = {}
+    for term in terms:
+        term_matches = _match(conn, fts, term, fuzzy)
+        for obj_id, rows in term_matches.items():
+            totals[obj_id] = totals.get(obj_id, 0.0) + max(score for score, _, _ in rows)
+        if matches is None:
+            matches = term_matches
+        else:
+            matches = {
+                obj_id: rows + term_matches[obj_id]
+                for obj_id, rows in matches.items()
+                if obj_id in term_matches
+            }
+    result = []
+    for obj_id in sorted(matches or {}, key=lambda obj_id: (-totals[obj_id], obj_id)):
+        rows = sorted(set(matches[obj_id]), key=lambda row: -row[0])  # type: ignore
+        for score, field, value in rows:
+            result.append({"obj_id": obj_id, "field": field, "value": value, "score": score})
+    return result[:limit]
+
+
+def iter_object_fields(
+    conn: sqlite3.Connection, obj_ids: typing.Optional[typing.List[int]]
+) -> typing.Iterator[typing.Tuple[int, typing.List[typing.Tuple[str, str]]]]:
+    """Yield the object ids with the searchable fields from the ``objects`` and ``categories``."""
+    rows: typing.Iterable[typing.Tuple[int, str]]
+    if obj_ids is None:
+        rows = conn.execute("SELECT id, data FROM objects")
+    else:
+        rows = []
+        for start in range(0, len(obj_ids), 500):
+            chunk = obj_ids[start : start + 500]
+            rows += conn.execute(
+                "SELECT id, data FROM objects WHERE id IN (%s)" % ", ".join("?" * len(chunk)),
+                chunk,
+            ).fetchall()
+    for obj_id, data in rows:
+        categories = conn.execute(
+            "SELECT category, data FROM categories WHERE obj_id = ? ORDER BY category", (obj_id,)
+        ).fetchall()
+        yield obj_id, object_fields(
+            codec.loads(data),
+            ((category, codec.loads(entries)) for category, entries in categories),
+        )
@@ -0,0 +1,67 @@
+"""On-disk cache of i-doit session ids.
+
+Allows to reuse a session over several invocations of ``idoit-cli`` rather than logging
+in and out each time.
+"""
+
+import json
+import os
+import typing
+
+from logzero import logger
+
+
+def default_cache_dir() -> str:
+    """Return the default cache directory of idoit-py (honours ``XDG_CACHE_HOME``)."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "idoit-py")
+
+
+class SessionCache:
+    """Store session ids in a JSON file keyed by server URL and user name.
+
+    The file and its directory are only accessible by the current user as the session ids
+    are as good as the credentials until they expire.
+    """
+
+    def __init__(self, path: typing.Optional[str] = None):
+        #: Path to the JSON file with the sessions.
+        self.path = path or os.path.join(default_cache_dir(), "sessions.json")
+
+    @staticmethod
+    def _key(server_url: str, user: str) -> str:
+        return "%s@%s" % (user, server_url)
+
+    def _load(self) -> typing.Dict[str, str]:
+        try:
+            with open(self.path, "rt") as inputf:
+                return json.load(inputf)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning("Ignoring corrupt session cache %s", self.path)
+            return {}
+
+    def _store(self, sessions: typing.Dict[str, str]) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", mode=0o700, exist_ok=True)
+        tmp_path = "%s.%d.tmp" % (self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wt") as outputf:
+            json.dump(sessions, outputf)
+        os.replace(tmp_path, self.path)
+
+    def get(self, server_url: str, user: str) -> typing.Optional[str]:
+        """Return cached session id for ``user`` on ``server_url``, if any."""
+        return self._load().get(self._key(server_url, user))
+
+    def put(self, server_url: str, user: str, session_id: str) -> None:
+        """Store the session id for ``user`` on ``server_url``."""
+        sessions = self._load()
+        sessions[self._key(server_url, user)] = session_id
+        self._store(sessions)
+
+    def remove(self, server_url: str, user: str) -> None:
+        """Remove the session id for ``user`` on ``server_url``, if any."""
+        sessions = self._load()
+        if sessions.pop(self._key(server_url, user), None) is not None:
+            self._store(sessions)
@@ -16,8 +16,8 @@ from ishell.console import Console
 from ishell.utils import _print
 from logzero import logger
 
-from .api import Client
-from .common import pprint
+from .caching import ResponseCache
+from .common import add_local_argument, make_client, pprint
 
 
 class InterfaceConsole(Command):
@@ -216,22 +216,27 @@ class ListCommand(GenericCommand):
             return super().execute(arr)
         else:
             p = inflect.engine()
-            res = self.run_query(arr)
-            max_title_len = max((len(obj["title"]) for obj in res["result"]))
+            # Only keep the fields needed for the labels rather than the whole objects.
+            objs = [
+                (int(obj["id"]), obj["title"], obj["type_title"], int(obj["type"]))
+                for obj in self.client.iter_objects(**self.get_query_params(arr))
+            ]
+            max_title_len = max((len(title) for _, title, _, _ in objs), default=0)
             print(
                 "Listing all (%d) %s\n"
-                % (len(res["result"]), p.plural(self.client.object_types[self.object_type]))
+                % (len(objs), p.plural(self.client.object_types[self.object_type]))
             )
-            print(columnize.columnize([self._label(obj, max_title_len) for obj in res["result"]]))
+            print(columnize.columnize([self._label(obj, max_title_len) for obj in objs]))
 
     def _label(self, obj, max_title_len):
+        obj_id, title, type_title, type_ = obj
         if self.object_type:
-            return ("%% 5d/%% %ds" % max_title_len) % (obj["id"], obj["title"])
+            return ("%% 5d/%% %ds" % max_title_len) % (obj_id, title)
         else:
             return ("%% 5d/%% %ds %%- 10s" % max_title_len) % (
-                obj["id"],
-                obj["title"],
-                "(%s/%d)" % (obj["type_title"], obj["type"]),
+                obj_id,
+                title,
+                "(%s/%d)" % (type_title, type_),
             )
 
     def get_query_params(self, arr):
@@ -245,9 +250,7 @@ class OneObjectCommand(GenericCommand):
     def args(self):
         x = [
             "%s/%s" % (res["id"], res["title"])
-            for res in self.client.query(
-                "cmdb.objects.read", params={"filter": {"type": self.object_type}}
-            )["result"]
+            for res in self.client.iter_objects(filter={"type": self.object_type})
         ]
         return x
 
@@ -394,13 +397,13 @@ class ShowCommand(OneObjectCommand):
             if not res:
                 logger.warn("Found no such %s", self.client.object_types[self.object_type])
                 return
-            if res["objecttype"] != self.object_type:
+            if int(res["objecttype"]) != self.object_type:
                 logger.warn(
                     "Expected object type %s/%s but was %s/%s",
                     self.object_type,
                     self.client.object_types[self.object_type],
                     res["objecttype"],
-                    self.client.object_types[res["objecttype"]],
+                    self.client.object_types[int(res["objecttype"])],
                 )
         _show(self.config, self.client.object_types[self.object_type], res)
 
@@ -431,7 +434,8 @@ def run(args, parser, subparser):
         print_raw_json=args.print_raw_json,
     )
 
-    with Client(args.idoit_url, args.idoit_user, args.idoit_password, args.idoit_api_key) as client:
+    # Repeated shows and completions are answered from the cache.
+    with make_client(args, cache=ResponseCache()) as client:
         console = Console("i-doit")
 
         enable = EnableCommand(config, client, "enable", help="Enter edit mode")
@@ -462,5 +466,6 @@ def setup_argparse(parser: argparse.ArgumentParser) -> None:
     parser.add_argument(
         "--json-path", "-p", help="Dot-separated path in JSON to extract (when tokens are given)"
     )
+    add_local_argument(parser)
 
     parser.add_argument("tokens", nargs="*", help="Command tokens to execute.")
@@ -0,0 +1,112 @@
+"""Incremental decoding of large JSON-RPC responses.
+
+Allows to process the elements of the ``result`` array of a response while it is still being
+received, so the whole response never has to be held in memory.
+"""
+
+import codecs
+import json
+import typing
+
+#: Drop consumed characters from the buffer once this many have accumulated.
+_COMPACT_THRESHOLD = 1 << 16
+
+
+class _Scanner:
+    """Character buffer on top of an iterable of byte chunks."""
+
+    def __init__(self, chunks: typing.Iterable[bytes]):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def more(self) -> bool:
+        """Read the next chunk into the buffer, return ``False`` on end of input."""
+        if self.eof:
+            return False
+        if self.pos > _COMPACT_THRESHOLD:
+            self.buf, self.pos = self.buf[self.pos :], 0
+        try:
+            self.buf += self.decoder.decode(next(self.chunks))
+        except StopIteration:
+            self.buf += self.decoder.decode(b"", final=True)
+            self.eof = True
+        return True
+
+    def peek(self) -> str:
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                raise ValueError("Unexpected end of JSON input")
+
+    def expect(self, chars: str) -> str:
+        """Consume the next non-whitespace character, it must be one of ``chars``."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError("Expected one of %r at position %d, got %r" % (chars, self.pos, char))
+        self.pos += 1
+        return char
+
+    def value(self) -> typing.Any:
+        """Decode and consume the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self.more():
+                    raise
+                continue
+            # A number at the end of the buffer might continue in the next chunk.
+            if end < len(self.buf) or not self.more():
+                self.pos = end
+                return value
+
+
+class ResponseError(Exception):
+    """JSON-RPC error response, the ``error`` object is in the attribute of the same name."""
+
+    def __init__(self, error: typing.Any):
+        super().__init__("Server returned error: %s" % (error,))
+        self.error = error
+
+
+def iter_json_array(
+    chunks: typing.Iterable[bytes], key: str = "result"
+) -> typing.Iterator[typing.Any]:
+    """Yield the elements of the array at ``key`` of the JSON object read from ``chunks``.
+
+    Only the current element is decoded at any time.  If the object has a non-null
+    ``"error"`` entry instead (as for JSON-RPC errors), a ``ResponseError`` is raised.
+    """
+    scanner = _Scanner(chunks)
+    scanner.expect("{")
+    if scanner.peek() == "}":
+        return
+    while True:
+        name = scanner.value()
+        scanner.expect(":")
+        if name == key:
+            if scanner.peek() != "[":
+                raise ValueError("Expected JSON array at %r" % key)
+            scanner.expect("[")
+            if scanner.peek() == "]":
+                scanner.expect("]")
+            else:
+                while True:
+                    yield scanner.value()
+                    if scanner.expect(",]") == "]":
+                        break
+        else:
+            value = scanner.value()
+            if name == "error" and value:
+                raise ResponseError(value)
+        if scanner.expect(",}") == "}":
+            return
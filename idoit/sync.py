@@ -0,0 +1,79 @@
+"""Implementation of ``idoit-cli sync`` command.
+
+Copies the objects and selected categories into the local mirror used with ``--local``.
+"""
+
+import argparse
+
+from logzero import logger
+
+from .common import make_client, mirror_path, pprint
+from .mirror import DEFAULT_CATEGORIES, Mirror, sync, sync_incremental
+
+
+def setup_argparse(parser: argparse.ArgumentParser) -> None:
+    """Main entry point for subcommand."""
+
+    parser.add_argument(
+        "--categories",
+        default=",".join(DEFAULT_CATEGORIES),
+        help="Comma-separated constants of the categories to copy, default: %(default)s",
+    )
+    parser.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Number of objects to fetch per request, default: %(default)s",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=100,
+        help="Number of category reads per batch request, default: %(default)s",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-j",
+        type=int,
+        default=4,
+        help="Number of batch requests to send in parallel, default: %(default)s",
+    )
+    parser.add_argument(
+        "--incremental",
+        "-i",
+        action="store_true",
+        default=False,
+        help="Only fetch the objects modified since the last sync",
+    )
+    parser.add_argument(
+        "--stats", action="store_true", default=False, help="Only print mirror statistics"
+    )
+
+
+def run(args, parser, subparser):
+    """Main entry point for sync command."""
+    mirror = Mirror(mirror_path(args))
+    try:
+        if args.stats:
+            pprint(mirror.stats())
+            return
+        # The mirror must reflect the server, never responses from the on-disk cache.
+        with make_client(args, cache=None) as client:
+            counts = (sync_incremental if args.incremental else sync)(
+                client,
+                mirror,
+                categories=[c for c in args.categories.split(",") if c],
+                page_size=args.page_size,
+                batch_size=args.batch_size,
+                concurrency=args.concurrency,
+            )
+        logger.info(
+            "Synced %d objects and %d category entries to %s, removed %d objects (%d errors)",
+            counts["objects"],
+            counts["categories"],
+            mirror.path,
+            counts["removed"],
+            counts["errors"],
+        )
+    finally:
+        mirror.close()
@@ -0,0 +1,96 @@
+"""Client-side throttling of the requests to the server.
+
+Used by ``idoit.api.Client`` to avoid overloading the i-doit PHP workers and database when
+sending many requests in parallel.
+"""
+
+import threading
+import time
+import typing
+
+
+class TokenBucket:
+    """Token bucket rate limiter allowing ``rate`` requests per second on average.
+
+    Up to ``burst`` requests may be sent at once after a period of inactivity.  Thread-safe.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: typing.Optional[float] = None,
+        clock: typing.Callable[[], float] = time.monotonic,
+        sleep: typing.Callable[[float], typing.Any] = time.sleep,
+    ):
+        self.rate = rate
+        self.burst = max(1.0, rate) if burst is None else burst
+        self.clock = clock
+        self.sleep = sleep
+        self._tokens = self.burst
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a request may be sent."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            # Take the token right away, possibly going into debt, and wait for it outside of
+            # the lock so that the waiting threads are served in order.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            self.sleep(wait)
+
+
+class AdaptiveConcurrencyLimiter:
+    """Limit the number of requests in flight, adapting the limit to the server's health.
+
+    Uses additive increase/multiplicative decrease (AIMD) as in TCP congestion control:
+    each request completing successfully within ``latency_target`` seconds increases the
+    limit by ``1 / limit`` (i.e., by about one per round trip), while a failed or slow
+    request multiplies it by ``backoff`` (at most once per ``latency_target`` seconds).  The
+    limit stays between ``min_limit`` and ``max_limit``.  Thread-safe.
+    """
+
+    def __init__(
+        self,
+        initial_limit: float = 4,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        latency_target: float = 1.0,
+        backoff: float = 0.5,
+        clock: typing.Callable[[], float] = time.monotonic,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.backoff = backoff
+        self.clock = clock
+        #: The current limit, fractional to allow for the additive increase.
+        self.limit = float(initial_limit)
+        #: The number of requests currently in flight.
+        self.in_flight = 0
+        self._last_decrease = -float("inf")
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Block until another request may be sent."""
+        with self._cond:
+            while self.in_flight >= int(self.limit):
+                self._cond.wait()
+            self.in_flight += 1
+
+    def release(self, latency: float, ok: bool = True) -> None:
+        """Register the completion of a request after ``latency`` seconds."""
+        with self._cond:
+            self.in_flight -= 1
+            if ok and latency <= self.latency_target:
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            else:
+                now = self.clock()
+                if now - self._last_decrease >= self.latency_target:
+                    self._last_decrease = now
+                    self.limit = max(self.min_limit, self.limit * self.backoff)
+            self._cond.notify_all()
@@ -49,6 +49,7 @@ setup(
     entry_points={"console_scripts": ("idoit-cli = idoit.__main__:main",)},
     description="(Limited) CLI for i-doit in Python3",
     install_requires=install_requirements,
+    extras_require={"async": ["aiohttp"], "fast": ["orjson"]},
     license="MIT license",
     long_description=readme + "\n\n" + history,
     # long_description_content_type="text/markdown",
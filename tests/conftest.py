@@ -0,0 +1,62 @@
+"""Fixtures shared by the tests."""
+
+import functools
+
+import pytest
+
+from idoit.api import Client
+from idoit.fakeserver import FakeCmdb, FakeServer
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "num_objects(n): number of objects in the CMDB of the fake server"
+    )
+
+
+class FakeClock:
+    """Clock for injection into rate limiters and caches, advanced by hand or ``sleep()``."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def server(request):
+    """Fake server with 100 objects, or as many as given by the ``num_objects`` marker."""
+    marker = request.node.get_closest_marker("num_objects")
+    num_objects = marker.args[0] if marker else 100
+    with FakeServer(FakeCmdb(num_objects=num_objects)) as server:
+        yield server
+
+
+@pytest.fixture
+def connect(server):
+    """Return a function creating a ``Client`` for ``server``, passing on keyword arguments."""
+    return functools.partial(Client, server.url, server.user, server.password, server.api_key)
+
+
+@pytest.fixture
+def credentials(server):
+    """Command line arguments for connecting to ``server``."""
+    return [
+        "--idoit-url",
+        server.url,
+        "--idoit-user",
+        server.user,
+        "--idoit-password",
+        server.password,
+        "--idoit-api-key",
+        server.api_key,
+    ]
@@ -0,0 +1,61 @@
+"""Tests for ``idoit.aio``."""
+
+import asyncio
+
+import pytest
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web  # noqa: E402
+
+from idoit.aio import AsyncClient  # noqa: E402
+
+#: Number of requests currently and maximally in flight on the test server.
+STATS = {"in_flight": 0, "max_in_flight": 0}
+
+
+async def _handle(request):
+    payload = await request.json()
+    if payload["method"] == "idoit.login":
+        result = {"session-id": "s3cr3t"}
+    else:
+        assert request.headers["X-RPC-Auth-Session"] == "s3cr3t"
+        await asyncio.sleep(0.01)
+        STATS["in_flight"] += 1
+        STATS["max_in_flight"] = max(STATS["max_in_flight"], STATS["in_flight"])
+        await asyncio.sleep(0.01)
+        STATS["in_flight"] -= 1
+        result = {
+            "idoit.logout": {"result": True},
+            "idoit.version": {"version": "1.14"},
+            "cmdb.object.read": {"id": payload["params"].get("id")},
+        }[payload["method"]]
+    return web.json_response({"jsonrpc": "2.0", "id": payload["id"], "result": result})
+
+
+async def _run_client():
+    app = web.Application()
+    STATS.update(in_flight=0, max_in_flight=0)
+    app.router.add_post("/src/jsonrpc.php", _handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        url = "http://127.0.0.1:%d/" % port
+        async with AsyncClient(url, "user", "password", "key", concurrency=3) as client:
+            version = await client.query_version()
+            results = await asyncio.gather(
+                *(client.query("cmdb.object.read", {"id": i}) for i in range(20))
+            )
+        assert client.session_id is None
+        return version, [r["result"]["id"] for r in results], STATS["max_in_flight"]
+    finally:
+        await runner.cleanup()
+
+
+def test_async_client():
+    version, ids, max_in_flight = asyncio.run(_run_client())
+    assert version == "1.14"
+    assert ids == list(range(20))
+    assert 1 < max_in_flight <= 3
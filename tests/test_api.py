@@ -0,0 +1,379 @@
+"""Tests for ``idoit.api``."""
+
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import threading
+import time
+
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from idoit.api import Client
+from idoit.caching import ResponseCache
+from idoit.session_cache import SessionCache
+from idoit.throttle import AdaptiveConcurrencyLimiter
+
+URL = "https://idoit.example.com"
+RPC_URL = URL + "/src/jsonrpc.php"
+
+
+def _respond(request, _context):
+    """Answer i-doit JSON-RPC requests with canned results."""
+    payload = request.json()
+    results = {
+        "idoit.login": {"session-id": "s3cr3t"},
+        "idoit.logout": {"message": "Logout successful", "result": True},
+        "idoit.version": {"version": "1.14"},
+        "cmdb.object_types.read": [
+            {"id": "5", "title": "Server", "const": "C__OBJTYPE__SERVER"},
+            {"id": "59", "title": "Virtual machine", "const": "C__OBJTYPE__VIRTUAL_MACHINE"},
+        ],
+    }
+    return {"jsonrpc": "2.0", "id": payload["id"], "result": results[payload["method"]]}
+
+
+@pytest.fixture
+def client():
+    return Client(URL, "user", "password", "api-key")
+
+
+def test_query_requires_login(client):
+    with pytest.raises(Exception):
+        client.query_version()
+
+
+def test_context_manager(requests_mock, client):
+    requests_mock.post(RPC_URL, json=_respond)
+    with client:
+        assert client.session_id == "s3cr3t"
+        assert client.query_version() == "1.14"
+        assert requests_mock.last_request.headers["X-RPC-Auth-Session"] == "s3cr3t"
+    assert client.session_id is None
+    assert client._adapter is None
+
+
+def test_connection_pool_reused(requests_mock, client):
+    requests_mock.post(RPC_URL, json=_respond)
+    with client:
+        session = client._http_session()
+        client.query_version()
+        assert client._http_session() is session
+        assert session.get_adapter(RPC_URL)._pool_maxsize == client.pool_maxsize
+
+
+def test_thread_safety(requests_mock, client):
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "cmdb.object.read":
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": payload["params"]}
+        return _respond(request, context)
+
+    requests_mock.post(RPC_URL, json=respond)
+    params = [{"id": i} for i in range(200)]
+    sessions = set()
+
+    def query(params):
+        sessions.add(client._http_session())
+        return client.query("cmdb.object.read", params)
+
+    with client:
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(query, params))
+        adapter = client._adapter
+    assert [r["result"]["id"] for r in results] == list(range(200))
+    assert len({r["id"] for r in results}) == 200
+    assert params == [{"id": i} for i in range(200)]
+    assert len(sessions) > 1
+    assert all(session.adapters["https://"] is adapter for session in sessions)
+
+
+def test_query_many(requests_mock, client):
+    def respond(request, context):
+        if isinstance(request.json(), dict):
+            return _respond(request, context)
+        # Answer batches in reverse order with an error for unknown methods.
+        return [
+            (
+                {"jsonrpc": "2.0", "id": call["id"], "result": {"id": call["params"]["id"]}}
+                if call["method"] == "cmdb.object.read"
+                else {"jsonrpc": "2.0", "id": call["id"], "error": {"code": -32601}}
+            )
+            for call in reversed(request.json())
+        ]
+
+    requests_mock.post(RPC_URL, json=respond)
+    calls = [
+        ("cmdb.object.read", {"id": 1}),
+        ("no.such.method", None),
+        ("cmdb.object.read", {"id": 3}),
+    ]
+    with client:
+        responses = client.query_many(calls, batch_size=2)
+    assert [r.get("result") for r in responses] == [{"id": 1}, None, {"id": 3}]
+    assert responses[1]["error"] == {"code": -32601}
+    assert calls[0] == ("cmdb.object.read", {"id": 1})  # params untouched
+
+
+def test_object_types_lazy(requests_mock, client):
+    requests_mock.post(RPC_URL, json=_respond)
+    with client:
+        assert requests_mock.call_count == 1  # only login
+        assert client.object_types == {5: "server", 59: "virtual-machine"}
+        assert client.object_types == {5: "server", 59: "virtual-machine"}
+        assert requests_mock.call_count == 2
+        assert requests_mock.last_request.json()["method"] == "cmdb.object_types.read"
+
+
+def test_session_cache(requests_mock, tmp_path):
+    requests_mock.post(RPC_URL, json=_respond)
+    cache = SessionCache(str(tmp_path / "sessions.json"))
+    with Client(URL, "user", "password", "api-key", session_cache=cache):
+        pass
+    assert cache.get(URL, "user") == "s3cr3t"
+    assert (tmp_path / "sessions.json").stat().st_mode & 0o777 == 0o600
+    assert [r.json()["method"] for r in requests_mock.request_history] == ["idoit.login"]
+
+    with Client(URL, "user", "password", "api-key", session_cache=cache) as client:
+        assert client.query_version() == "1.14"
+    methods = [r.json()["method"] for r in requests_mock.request_history]
+    assert methods == ["idoit.login", "idoit.version"]
+
+
+def test_session_cache_relogin(requests_mock, tmp_path):
+    def respond(request, context):
+        if request.headers.get("X-RPC-Auth-Session") == "expired":
+            return {"jsonrpc": "2.0", "id": request.json()["id"], "error": {"code": -32604}}
+        return _respond(request, context)
+
+    requests_mock.post(RPC_URL, json=respond)
+    cache = SessionCache(str(tmp_path / "sessions.json"))
+    cache.put(URL, "user", "expired")
+    with Client(URL, "user", "password", "api-key", session_cache=cache) as client:
+        assert client.query_version() == "1.14"
+    methods = [r.json()["method"] for r in requests_mock.request_history]
+    assert methods == ["idoit.version", "idoit.login", "idoit.version"]
+    assert cache.get(URL, "user") == "s3cr3t"
+
+
+def test_sessions_released(requests_mock, client, monkeypatch):
+    def count_sessions():
+        gc.collect()
+        return sum(isinstance(obj, requests.Session) for obj in gc.get_objects())
+
+    requests_mock.post(RPC_URL, json=_respond)
+    with client:
+        before = count_sessions()
+        for _ in range(20):
+            list(client.map("idoit.version", [{}] * 8, concurrency=4))
+        assert count_sessions() <= before + 1
+        closed = []
+        monkeypatch.setattr(client._adapter, "close", lambda: closed.append(True))
+    assert closed
+
+
+def test_map(requests_mock, client):
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "cmdb.object.read":
+            if payload["params"]["id"] == 13:
+                context.status_code = 502
+                return {}
+            time.sleep(0.001 * (payload["params"]["id"] % 5))
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": payload["params"]}
+        return _respond(request, context)
+
+    requests_mock.post(RPC_URL, json=respond)
+    with client:
+        results = list(
+            client.map("cmdb.object.read", ({"id": i} for i in range(50)), concurrency=4)
+        )
+    assert isinstance(results[13], requests.HTTPError)
+    assert [r["result"]["id"] for i, r in enumerate(results) if i != 13] == [
+        i for i in range(50) if i != 13
+    ]
+
+
+def test_session_pool(requests_mock):
+    lock = threading.Lock()
+    logins, in_flight, seen = [], set(), set()
+
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "idoit.login":
+            logins.append("s%d" % len(logins))
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": {"session-id": logins[-1]}}
+        session_id = request.headers["X-RPC-Auth-Session"]
+        if payload["method"] == "cmdb.object.read":
+            with lock:
+                assert session_id not in in_flight  # sessions are used one at a time
+                in_flight.add(session_id)
+                seen.add(session_id)
+            time.sleep(0.005)
+            with lock:
+                in_flight.remove(session_id)
+        elif payload["method"] == "idoit.logout":
+            logins.remove(session_id)
+        return {"jsonrpc": "2.0", "id": payload["id"], "result": payload["params"]}
+
+    requests_mock.post(RPC_URL, json=respond)
+    with Client(URL, "user", "password", "api-key", sessions=3) as client:
+        params = ({"id": i} for i in range(30))
+        results = list(client.map("cmdb.object.read", params, concurrency=6))
+    assert [r["result"]["id"] for r in results] == list(range(30))
+    assert seen == {"s0", "s1", "s2"}
+    assert logins == []
+
+
+def test_sessionless(requests_mock):
+    requests_mock.post(RPC_URL, json=_respond)
+    with Client(URL, "user", "password", "api-key", sessionless=True) as client:
+        assert client.query_version() == "1.14"
+    assert [r.json()["method"] for r in requests_mock.request_history] == ["idoit.version"]
+    request = requests_mock.last_request
+    assert request.json()["params"]["apikey"] == "api-key"
+    assert request.headers["X-RPC-Auth-Username"] == "user"
+    assert "X-RPC-Auth-Session" not in request.headers
+
+
+@pytest.mark.parametrize("prefetch", [True, False])
+def test_iter_objects(requests_mock, client, prefetch):
+    objects = [{"id": i, "title": "obj-%d" % i, "type": 5} for i in range(25)]
+
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "cmdb.objects.read":
+            assert payload["params"]["filter"] == {"type": 5}
+            offset, count = map(int, payload["params"]["limit"].split(","))
+            result = objects[offset : offset + count]
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": result}
+        return _respond(request, context)
+
+    requests_mock.post(RPC_URL, json=respond)
+    with client:
+        result = list(client.iter_objects(filter={"type": 5}, page_size=10, prefetch=prefetch))
+    assert result == objects
+    assert len(requests_mock.request_history) == 5  # login, 3 pages, logout
+
+
+def test_iter_query(requests_mock, client):
+    objects = [{"id": i, "title": "obj-%d" % i} for i in range(100)]
+
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "cmdb.objects.read":
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": objects}
+        return _respond(request, context)
+
+    requests_mock.post(RPC_URL, json=respond)
+    with client:
+        assert list(client.iter_query("cmdb.objects.read", chunk_size=10)) == objects
+        assert client.stats()["cmdb.objects.read"]["count"] == 1
+        assert client.stats()["cmdb.objects.read"]["response_bytes"] > 1000
+
+
+def test_iter_query_retry_and_relogin(requests_mock, client, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda delay: None)
+    failures = [502]
+
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "idoit.login":
+            logins.append("s%d" % len(logins))
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": {"session-id": logins[-1]}}
+        if payload["method"] == "cmdb.objects.read":
+            if failures:
+                context.status_code = failures.pop()
+                return {}
+            if request.headers["X-RPC-Auth-Session"] == "s0":
+                return {"jsonrpc": "2.0", "id": payload["id"], "error": {"code": -32604}}
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": [{"id": 1}]}
+        return _respond(request, context)
+
+    logins = []
+    requests_mock.post(RPC_URL, json=respond)
+    client.concurrency_limiter = AdaptiveConcurrencyLimiter(initial_limit=2)
+    with client:
+        assert list(client.iter_query("cmdb.objects.read")) == [{"id": 1}]
+        assert client.session_id == "s1"
+        assert client.stats()["cmdb.objects.read"]["count"] == 3
+        assert client.stats()["cmdb.objects.read"]["errors"] == 2
+        assert client.concurrency_limiter.in_flight == 0
+
+
+def test_response_cache(requests_mock, client):
+    requests_mock.post(RPC_URL, json=_respond)
+    client.cache = ResponseCache()
+    with client:
+        for _ in range(3):
+            assert client.query_version() == "1.14"
+        assert requests_mock.call_count == 2  # login + one version
+        assert client.cache.stats()["hits"] == 2
+
+
+def test_retry(requests_mock, client, monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(time, "sleep", sleeps.append)
+    failures = {"idoit.version": 2, "cmdb.object.update": 1}
+
+    def respond(request, context):
+        method = request.json()["method"]
+        if failures.get(method):
+            failures[method] -= 1
+            context.status_code = 502
+            return {}
+        return _respond(request, context)
+
+    requests_mock.post(RPC_URL, json=respond)
+    with client:
+        assert client.query_version() == "1.14"
+        assert len(sleeps) == 2
+        assert all(0 <= delay <= 0.5 * 2**i for i, delay in enumerate(sleeps))
+        with pytest.raises(requests.HTTPError):  # not idempotent
+            client.query("cmdb.object.update", {"id": 1, "title": "x"})
+        assert len(sleeps) == 2
+
+        # Writes are retried if the connection was refused but not if it was lost.
+        refused = MaxRetryError(None, RPC_URL, NewConnectionError(None, "Connection refused"))
+        requests_mock.post(
+            RPC_URL,
+            [
+                {"exc": requests.ConnectionError(refused)},
+                {"json": {"jsonrpc": "2.0", "id": 4, "result": {"success": True}}},
+            ],
+        )
+        assert client.query("cmdb.object.update", {"id": 1, "title": "x"})["result"]
+        requests_mock.post(RPC_URL, exc=requests.ConnectionError("Connection aborted"))
+        with pytest.raises(requests.ConnectionError):
+            client.query("cmdb.object.update", {"id": 1, "title": "x"})
+        assert len(sleeps) == 3
+        requests_mock.post(RPC_URL, json=respond)
+
+
+def test_relogin(requests_mock, client):
+    def respond(request, context):
+        payload = request.json()
+        if payload["method"] == "idoit.login":
+            logins.append("s%d" % len(logins))
+            return {"jsonrpc": "2.0", "id": payload["id"], "result": {"session-id": logins[-1]}}
+        if request.headers["X-RPC-Auth-Session"] == "s0":  # first session expires immediately
+            return {"jsonrpc": "2.0", "id": payload["id"], "error": {"code": -32604}}
+        return _respond(request, context)
+
+    logins = []
+    requests_mock.post(RPC_URL, json=respond)
+    with client:
+        assert client.query_version() == "1.14"
+        assert client.session_id == "s1"
+
+
+def test_stats(requests_mock, client):
+    requests_mock.post(RPC_URL, json=_respond)
+    with client:
+        client.query_version()
+        client.query_version()
+    stats = client.stats()
+    assert sorted(stats) == ["idoit.login", "idoit.logout", "idoit.version"]
+    assert stats["idoit.version"]["count"] == 2
+    assert stats["idoit.version"]["errors"] == 0
+    assert stats["idoit.version"]["request_bytes"] > 0
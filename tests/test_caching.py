@@ -0,0 +1,80 @@
+"""Tests for ``idoit.caching``."""
+
+import os
+
+from idoit.caching import DiskCache, ResponseCache, is_read_method, is_write_method
+
+
+def test_is_write_method():
+    assert is_write_method("cmdb.object.update")
+    assert is_write_method("cmdb.category.save")
+    assert not is_write_method("cmdb.object.read")
+
+
+def test_short_method_names():
+    assert is_read_method("cmdb.object")
+    assert not is_read_method("cmdb.object.update")
+    cache = ResponseCache()
+    cache.put("cmdb.object", {"id": 1}, {"result": {"id": 1}})
+    assert cache.get("cmdb.object.read", {"id": 1}) == {"result": {"id": 1}}
+    assert cache.get("cmdb.object", {"id": 1}) == {"result": {"id": 1}}
+    assert cache.stats()["hits"] == 2
+    cache.put("cmdb.object_types", {"countobjects": True}, {"result": []})
+    assert cache.get("cmdb.object_types", {"countobjects": True}) is None
+
+
+def test_response_cache_ttl(clock):
+    cache = ResponseCache(ttls={"cmdb.object.read": 10}, clock=clock)
+    cache.put("cmdb.object.read", {"id": 1}, {"result": {"id": 1}})
+    cache.put("cmdb.object.update", {"id": 1}, {"result": {"success": True}})
+    response = cache.get("cmdb.object.read", {"id": 1})
+    assert response == {"result": {"id": 1}}
+    response["result"]["id"] = 2  # returned copies may be modified
+    assert cache.get("cmdb.object.read", {"id": 1}) == {"result": {"id": 1}}
+    assert cache.get("cmdb.object.update", {"id": 1}) is None
+    clock.now = 11
+    assert cache.get("cmdb.object.read", {"id": 1}) is None
+    assert cache.stats() == {"hits": 2, "misses": 1, "evictions": 0, "size": 0}
+
+
+def test_response_cache_lru_and_invalidation():
+    cache = ResponseCache(max_size=2)
+    cache.put("cmdb.object.read", {"id": 1}, {"result": 1})
+    cache.put("idoit.constants", None, {"result": "c"})
+    assert cache.get("cmdb.object.read", {"id": 1}) == {"result": 1}
+    cache.put("cmdb.object.read", {"id": 2}, {"result": 2})  # evicts constants
+    assert cache.get("idoit.constants", {}) is None
+    cache.put("cmdb.dialog.read", {"category": "C__CATG__MODEL"}, {"error": {}})
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 1
+    cache.notify_write("cmdb.object.update")
+    assert cache.stats()["size"] == 0
+
+
+def test_disk_cache(tmp_path):
+    class Client:
+        server_url = "https://idoit.example.com"
+
+        def query_version(self):
+            response = cache.get("idoit.version", None)
+            if response is None:
+                response = {"result": {"version": "1.14"}}
+                cache.put("idoit.version", None, response)
+            return response["result"]["version"]
+
+    path = str(tmp_path / "cache" / "responses.sqlite3")
+    cache = DiskCache(path)
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    cache.bind(Client())
+    assert cache.scope == "https://idoit.example.com|1.14"
+    cache.put("cmdb.object.read", {"id": 1}, {"result": {"id": 1}})
+    cache.close()
+
+    cache = DiskCache(path)  # e.g., in another process
+    cache.bind(Client())
+    assert cache.get("cmdb.object.read", {"id": 1}) == {"result": {"id": 1}}
+    cache.notify_write("cmdb.object.update")
+    assert cache.get("cmdb.object.read", {"id": 1}) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["size"]) == (2, 2, 1)
+    cache.clear()
+    assert cache.stats()["size"] == 0
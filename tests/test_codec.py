@@ -0,0 +1,45 @@
+"""Tests for ``idoit.codec``."""
+
+import json
+
+import pytest
+
+from idoit.codec import CODECS, _codec_from_environment, get_codec
+
+
+def _available_codecs():
+    result = []
+    for name in CODECS:
+        try:
+            get_codec(name)
+            result.append(name)
+        except ImportError:
+            pass
+    return result
+
+
+@pytest.mark.parametrize("name", _available_codecs())
+def test_codec(name):
+    codec = get_codec(name)
+    obj = {"id": 1, "title": "Säule", "values": [1.5, None, True], "nested": {"a": []}}
+    assert codec.loads(codec.dumps_bytes(obj)) == obj
+    assert codec.loads(codec.dumps(obj, indent=2)) == obj
+    assert json.loads(codec.dumps(obj, indent=2)) == obj
+    assert "\n  " in codec.dumps(obj, indent=2)
+
+
+def test_get_codec_default():
+    assert get_codec().name == _available_codecs()[0]
+
+
+def test_codec_from_environment(monkeypatch):
+    class MissingCodec:
+        def __init__(self):
+            raise ImportError("No module named 'missing'")
+
+    monkeypatch.setitem(CODECS, "missing", MissingCodec)
+    for name in ("no-such-codec", "missing"):
+        monkeypatch.setenv("IDOIT_JSON_CODEC", name)
+        assert _codec_from_environment().name == "json"
+    monkeypatch.setenv("IDOIT_JSON_CODEC", "json")
+    assert _codec_from_environment().name == "json"
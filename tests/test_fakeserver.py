@@ -0,0 +1,108 @@
+"""Tests for ``idoit.fakeserver``, exercising ``idoit.api.Client`` against it."""
+
+import time
+
+import pytest
+import requests
+
+from idoit.api import Client
+from idoit.fakeserver import STATUS_ARCHIVED, FakeApi, FakeCmdb
+
+
+def test_read(server, connect):
+    with connect() as client:
+        assert client.query_version() == "1.14.2"
+        assert client.object_types[5] == "server"
+        obj = client.query("cmdb.object.read", {"id": 6})["result"]
+        assert (obj["objecttype"], obj["title"]) == (5, "server-000006")
+        assert client.query("cmdb.object", {"id": 6})["result"] == obj
+        servers = list(client.iter_objects(filter={"type": 5}, order_by="title", page_size=7))
+        assert [obj["id"] for obj in servers] == list(range(6, 101, 6))
+        ip = client.query("cmdb.category.read", {"objID": 6, "category": "C__CATG__IP"})
+        assert ip["result"][0]["hostname"] == "server-000006"
+        hits = client.query("idoit.search", {"q": "printer-00001"})["result"]
+        assert [hit["documentId"] for hit in hits] == [str(i) for i in range(11, 20, 6)]
+    assert server.api.sessions == set()
+
+
+def test_batch_and_update(server, connect):
+    with connect() as client:
+        calls = [("cmdb.object.read", {"id": i}) for i in (1, 2, 1000)]
+        calls.append(("cmdb.object.update", {"id": 1, "title": "renamed"}))
+        calls.append(("cmdb.object.read", {"id": 1}))
+        responses = client.query_many(calls)
+        assert responses[2]["result"] == []
+        assert responses[3]["result"]["success"]
+        assert responses[4]["result"]["title"] == "renamed"
+        assert server.api.calls["cmdb.object.read"] == 4
+
+
+def test_map_batches(connect):
+    with connect() as client:
+        ids = list(range(95, 120))
+        responses = list(
+            client.map_batches("cmdb.object.read", ({"id": i} for i in ids), batch_size=10)
+        )
+        assert [res["result"]["id"] if res["result"] else None for res in responses] == [
+            i if i <= 100 else None for i in ids
+        ]
+        assert client.stats()["batch"]["count"] == 3
+
+
+def test_large_cmdb():
+    cmdb = FakeCmdb(num_objects=1000000)
+    api = FakeApi(cmdb, "admin", "admin", "key")
+    cmdb.delete(999994, STATUS_ARCHIVED)
+    cmdb.update(11, title="renamed")
+
+    def ids(params):
+        return [obj["id"] for obj in api._cmdb_objects_read(params, {})]
+
+    assert ids({"limit": "999990,5"}) == [999991, 999992, 999993, 999995, 999996]
+    assert ids({"filter": {"type": 11}, "order_by": "id", "sort": "DESC", "limit": 3}) == [
+        999995,
+        999989,
+        999983,
+    ]
+    assert ids({"filter": {"type": 11}, "order_by": "updated", "sort": "DESC", "limit": 2}) == [
+        11,
+        999995,
+    ]
+    assert ids({"filter": {"title": "printer-000017"}}) == [17]
+    types = api._cmdb_object_types_read({"countobjects": True}, {})
+    assert [t["objectcount"] for t in types if t["id"] == "5"] == ["166666"]
+    hits = api._idoit_search({"q": "printer-99999"}, {})
+    assert [hit["documentId"] for hit in hits] == ["999995"]
+
+
+def test_auth(server, connect):
+    with connect(relogin=False) as client:
+        server.api.sessions.clear()  # expire session
+        assert client.query("idoit.version")["error"]["code"] == -32604
+    with connect(sessionless=True) as client:
+        assert client.query_version() == "1.14.2"
+    client = Client(server.url, "admin", "wrong", server.api_key, sessionless=True)
+    with client:
+        assert client.query("idoit.version")["error"]["code"] == -32604
+
+
+def test_session_serialization(server, connect):
+    server.latency = 0.05
+    with connect() as client:
+        start = time.monotonic()
+        list(client.map("cmdb.object.read", ({"id": i} for i in range(4)), concurrency=4))
+        assert time.monotonic() - start >= 0.2
+    with connect(sessions=4) as client:
+        start = time.monotonic()
+        list(client.map("cmdb.object.read", ({"id": i} for i in range(4)), concurrency=4))
+        assert time.monotonic() - start < 0.2
+
+
+def test_error_injection(server, connect, monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda _: None)
+    with connect(retries=2) as client:
+        server.error_rate = 1.0
+        with pytest.raises(requests.HTTPError):
+            client.query_version()
+        server.error_rate = 0.0
+    assert server.api.calls["idoit.version"] == 0
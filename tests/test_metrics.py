@@ -0,0 +1,28 @@
+"""Tests for ``idoit.metrics``."""
+
+import json
+
+from idoit.metrics import Metrics
+
+
+def test_metrics(tmp_path):
+    metrics = Metrics()
+    for i in range(100):
+        metrics.observe("cmdb.object.read", 0.001 * (i + 1), 100, 1000, error=(i == 0))
+    metrics.observe("idoit.version", 20.0)
+
+    stats = metrics.stats()
+    assert list(stats) == ["cmdb.object.read", "idoit.version"]
+    read = stats["cmdb.object.read"]
+    assert (read["count"], read["errors"], read["response_bytes"]) == (100, 1, 100000)
+    assert abs(read["latency_p50"] - 0.051) < 1e-9
+    assert abs(read["latency_p99"] - 0.1) < 1e-9
+
+    prom = metrics.to_prometheus()
+    assert 'idoit_rpc_requests_total{method="cmdb.object.read"} 100' in prom
+    assert 'idoit_rpc_latency_seconds_bucket{method="cmdb.object.read",le="0.05"} 50' in prom
+    assert 'idoit_rpc_latency_seconds_bucket{method="idoit.version",le="10.0"} 0' in prom
+    assert 'idoit_rpc_latency_seconds_bucket{method="idoit.version",le="+Inf"} 1' in prom
+
+    metrics.dump(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text()) == stats
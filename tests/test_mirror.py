@@ -0,0 +1,170 @@
+"""Tests for ``idoit.mirror`` and the ``sync`` command."""
+
+import contextlib
+import io
+
+import pytest
+
+from idoit.__main__ import main
+from idoit.caching import DiskCache
+from idoit.fakeserver import STATUS_ARCHIVED, STATUS_NORMAL
+from idoit.mirror import LocalClient, Mirror, sync, sync_incremental
+
+pytestmark = pytest.mark.num_objects(60)
+
+
+def test_sync_and_local_client(server, connect, tmp_path, monkeypatch):
+    path = str(tmp_path / "mirror.sqlite3")
+    with connect() as client:
+        counts = sync(client, Mirror(path), page_size=25, batch_size=7, concurrency=3)
+        remote = {
+            "servers": list(client.iter_objects(filter={"type": 5}, order_by="title")),
+            "object": client.query("cmdb.object.read", {"id": 6})["result"],
+            "ip": client.query("cmdb.category.read", {"objID": 6, "category": "C__CATG__IP"}),
+        }
+    assert counts == {"objects": 60, "categories": 180, "removed": 0, "errors": 0}
+
+    with LocalClient(Mirror(path)) as local:
+        assert local.object_types[59] == "virtual-machine"
+        assert local.query_version() == "1.14.2"
+        assert list(local.iter_objects(filter={"type": 5}, order_by="title")) == remote["servers"]
+        assert local.query("cmdb.object", {"id": 6})["result"] == remote["object"]
+        ip = local.query("cmdb.category.read", {"objID": 6, "category": "C__CATG__IP"})
+        assert ip["result"] == remote["ip"]["result"]
+        objs = local.query(
+            "cmdb.objects.read",
+            {
+                "filter": {"type": "C__OBJTYPE__SERVER"},
+                "order_by": "id",
+                "sort": "DESC",
+                "limit": "1,2",
+            },
+        )["result"]
+        assert [obj["id"] for obj in objs] == [54, 48]
+        assert [
+            hit["documentId"]
+            for hit in local.query("idoit.search", {"q": "ROUTER-00002"})["result"]
+        ] == ["22", "28"]
+        with pytest.raises(Exception):
+            local.query("cmdb.object.update", {"id": 6, "title": "x"})
+
+    # Objects that are no longer returned by the server are removed on the next sync, but
+    # not those missed while paging.
+    server.cmdb.delete(6, STATUS_ARCHIVED)
+    with connect() as client:
+        iter_objects = client.iter_objects
+
+        def skipping_iter_objects(*args, **kwargs):
+            assert kwargs["order_by"] == "id"
+            return (obj for obj in iter_objects(*args, **kwargs) if obj["id"] != 7)
+
+        monkeypatch.setattr(client, "iter_objects", skipping_iter_objects)
+        counts = sync(client, Mirror(path), categories=())
+    assert (counts["objects"], counts["removed"]) == (59, 1)
+    assert Mirror(path).get_object(7)["id"] == 7
+    assert Mirror(path).get_object(6) is None
+    assert Mirror(path).get_categories(6, "C__CATG__IP") is None
+
+
+def test_sync_incremental(server, connect, tmp_path):
+    mirror = Mirror(str(tmp_path / "mirror.sqlite3"))
+    with connect() as client:
+        assert sync_incremental(client, mirror)["objects"] == 60  # falls back to full sync
+        assert mirror.get_watermarks()[5] == "2020-01-01 01:00:00"  # object 60
+
+        server.cmdb.update(7, title="renamed")
+        server.cmdb.delete(12, STATUS_ARCHIVED)
+        category_reads = server.api.calls["cmdb.category.read"]
+        counts = sync_incremental(client, mirror, page_size=4)
+        # The newest object of each type is fetched again besides the modified one.
+        assert counts == {"objects": 7, "categories": 21, "removed": 1, "errors": 0, "rescanned": 1}
+        assert server.api.calls["cmdb.category.read"] - category_reads == 21
+        assert mirror.get_object(7)["title"] == "renamed"
+        assert mirror.get_categories(7, "C__CATG__GLOBAL")[0]["title"] == "renamed"
+        assert mirror.get_object(12) is None
+        assert mirror.get_watermarks()[59] == mirror.get_object(7)["updated"]
+
+        counts = sync_incremental(client, mirror)
+        assert (counts["objects"], counts["removed"], counts["rescanned"]) == (6, 0, 0)
+
+        # Status changes without new timestamp are found by the object counts.
+        server.cmdb.delete(18, STATUS_ARCHIVED, touch=False)
+        assert sync_incremental(client, mirror)["removed"] == 1
+        server.cmdb.update(18, status=STATUS_NORMAL, touch=False)
+        counts = sync_incremental(client, mirror)
+        assert (counts["objects"], counts["rescanned"]) == (7, 1)
+        assert mirror.get_object(18)["status"] == STATUS_NORMAL
+        assert mirror.get_categories(18, "C__CATG__IP")[0]["objID"] == 18
+        assert 18 in {hit["obj_id"] for hit in mirror.search("server-000018")}
+        assert sync_incremental(client, mirror)["rescanned"] == 0
+
+
+def test_search(server, connect, tmp_path):
+    mirror = Mirror(str(tmp_path / "mirror.sqlite3"))
+
+    def ids(query):
+        return sorted({hit["obj_id"] for hit in mirror.search(query)})
+
+    with connect() as client:
+        sync(client, mirror)
+        hits = mirror.search("server-000006")
+        assert (hits[0]["obj_id"], hits[0]["field"]) == (6, "Global > Title")
+        assert ids("printer-00001") == [11, 17]  # prefix
+        assert mirror.search("10.0.0.7")[0]["field"] == "C__CATG__IP > ipv4_address"
+        assert ids("SN%08X" % (6 * 2654435761 % 2**32)) == [6]
+        assert ids("dell server") == [12, 24, 36, 48, 60]  # all terms must match
+        assert ids("PowerEgde") == list(range(4, 61, 4))  # fuzzy
+        assert ids("PowerEgde") == ids("poweredge")
+        assert ids("no-such-thing") == []
+
+        server.cmdb.update(7, title="renamed")
+        sync_incremental(client, mirror)
+        assert ids("renamed") == [7]
+        assert 7 not in ids("virtual-machine-000007")
+
+    with LocalClient(mirror) as local:
+        hits = local.query("idoit.search", {"q": "server-000006"})["result"]
+        assert hits[0]["key"] == "Server > Global > Title"
+        assert hits[0]["documentId"] == "6"
+
+
+def test_cli_local(server, credentials, tmp_path):
+    args = ["--mirror-path", str(tmp_path / "mirror.sqlite3")]
+
+    def run(argv):
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            assert not main(argv)
+        return stdout.getvalue()
+
+    with pytest.raises(Exception):  # not synced yet
+        run(args + ["read", "--local", "6"])
+    run(credentials + args + ["sync"])
+    run(args + ["sync", "--stats"])  # without credentials
+    calls = sum(server.api.calls.values())
+    output = run(args + ["read", "--local", "6", "7"])
+    assert "SYSID_0000000006" in output and "SYSID_0000000007" in output
+    for cmd in (["server", "list"], ["server", "show", "6"]):
+        assert run(args + ["shell", "--local"] + cmd) == run(credentials + ["shell"] + cmd)
+    assert "server-000006" in run(args + ["search", "--local", "server-000006"])
+    # Only the commands run against the server sent requests.
+    assert sum(server.api.calls.values()) - calls == 8
+
+
+def test_cli_sync_bypasses_cache(server, credentials, tmp_path):
+    args = credentials + ["--cache", "--cache-dir", str(tmp_path)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        assert not main(args + ["read", "7"])
+    cache = DiskCache(str(tmp_path / "responses.sqlite3"))
+    cached = cache.stats()
+    server.cmdb.update(7, title="renamed")
+    assert not main(args + ["sync"])
+    # The sync neither looked up nor stored responses in the cache.
+    assert cache.stats() == cached
+    server.cmdb.delete(8, STATUS_ARCHIVED)
+    assert not main(args + ["sync", "--incremental"])
+    assert cache.stats() == cached
+    cache.close()
+    mirror = Mirror(str(tmp_path / "mirror.sqlite3"))
+    assert mirror.get_object(7)["title"] == "renamed"
+    assert mirror.get_object(8) is None
+    mirror.close()
@@ -0,0 +1,37 @@
+"""Tests for ``idoit.read``."""
+
+import contextlib
+import io
+
+import pytest
+
+from idoit.__main__ import main
+from idoit.read import parse_ids
+
+pytestmark = pytest.mark.num_objects(30)
+
+
+def test_parse_ids():
+    assert list(parse_ids("7")) == [7]
+    assert list(parse_ids(" 3-5\n")) == [3, 4, 5]
+    for spec in ("", "x", "5-3", "-3", "1-2-3"):
+        with pytest.raises(ValueError):
+            parse_ids(spec)
+
+
+def test_cli_read_streaming(server, credentials, tmp_path, monkeypatch):
+    path = tmp_path / "ids.txt"
+    path.write_text("# servers\n12\n\n18-19\nnot-an-id\n")
+    monkeypatch.setattr("sys.stdin", io.StringIO("6\n7\n"))
+
+    argv = ["read", "--chunk-size", "2", "--from-file", str(path), "1-2", "-", "24"]
+    with contextlib.redirect_stdout(io.StringIO()) as stdout:
+        assert not main(credentials + argv)
+    output = stdout.getvalue()
+    sysids = ["SYSID_%010d" % i for i in (1, 2, 6, 7, 24, 12, 18, 19)]
+    positions = [output.index(sysid) for sysid in sysids]
+    assert positions == sorted(positions)
+    assert server.api.calls["cmdb.object.read"] == len(sysids)
+
+    with pytest.raises(SystemExit):
+        main(credentials + ["read", "1-x"])
@@ -0,0 +1,66 @@
+"""Tests for ``idoit.recording``."""
+
+import contextlib
+import io
+import os
+
+import pytest
+import requests
+
+from idoit.__main__ import main
+from idoit.api import Client
+from idoit.recording import Recorder, ReplayAdapter, load_recording
+
+pytestmark = pytest.mark.num_objects(20)
+
+
+def test_record_and_replay(connect, tmp_path):
+    path = str(tmp_path / "session.ndjson")
+    with Recorder(path) as recorder:
+        with connect(recorder=recorder) as client:
+            first = client.query("cmdb.object.read", {"id": 6})["result"]
+            assert client.object_types[5] == "server"
+            calls = [("cmdb.object.read", {"id": i}) for i in (1, 2)]
+            batch = [res["result"] for res in client.query_many(calls)]
+            servers = list(client.iter_query("cmdb.objects.read", {"filter": {"type": 5}}))
+
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    entries = load_recording(path)
+    assert [e["request"]["method"] for e in entries[:2]] == ["idoit.login", "cmdb.object.read"]
+    assert all("apikey" not in e["request"]["params"] for e in entries[:2])
+    assert entries[1]["status"] == 200 and entries[1]["duration"] > 0
+
+    # Replay without a server and in a different order.
+    adapter = ReplayAdapter(path)
+    with Client("http://replay", "admin", "admin", "other-key", adapter=adapter) as client:
+        responses = client.query_many(calls)
+        assert [res["result"] for res in responses] == batch
+        assert [res["id"] for res in responses] == [2, 3]  # ids of the new requests
+        assert client.query("cmdb.object.read", {"id": 6})["result"] == first
+        assert client.query("cmdb.object.read", {"id": 6})["result"] == first  # repeated
+        assert client.object_types[5] == "server"
+        assert list(client.iter_query("cmdb.objects.read", {"filter": {"type": 5}})) == servers
+        with pytest.raises(requests.HTTPError):
+            client.query("cmdb.object.read", {"id": 7})
+
+
+def test_replay_connection_error(tmp_path):
+    path = str(tmp_path / "session.ndjson")
+    with Recorder(path) as recorder:
+        request = {"method": "idoit.version", "params": {}, "jsonrpc": "2.0", "id": 1}
+        recorder.record(request, None, status=None, timestamp=0.0, duration=0.1)
+    session = requests.Session()
+    session.mount("http://", ReplayAdapter(path))
+    with pytest.raises(requests.ConnectionError):
+        session.post("http://replay/src/jsonrpc.php", json=request)
+
+
+def test_cli_record_and_replay(credentials, tmp_path):
+    path = str(tmp_path / "session.ndjson")
+    outputs = []
+    for argv in (credentials + ["--record", path], ["--replay", path]):
+        with contextlib.redirect_stdout(io.StringIO()) as stdout:
+            assert not main(argv + ["read", "6", "7"])
+        outputs.append(stdout.getvalue())
+    assert "server-000006" in outputs[0]
+    assert outputs[0] == outputs[1]
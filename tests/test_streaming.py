@@ -0,0 +1,35 @@
+"""Tests for ``idoit.streaming``."""
+
+import json
+
+import pytest
+
+from idoit.streaming import iter_json_array
+
+
+def _chunks(text, size):
+    data = text.encode("utf-8")
+    return (data[i : i + size] for i in range(0, len(data), size))
+
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1024])
+def test_iter_json_array(size):
+    result = [{"id": i, "title": 'Säule "%d"' % i, "tags": [1, 2.5, None]} for i in range(20)]
+    result += [12345, "x", []]
+    text = json.dumps({"jsonrpc": "2.0", "result": result, "id": 17}, indent=1)
+    assert list(iter_json_array(_chunks(text, size))) == result
+
+
+def test_iter_json_array_empty():
+    assert list(iter_json_array(_chunks('{"id": 1, "result": [ ]}', 4))) == []
+
+
+def test_iter_json_array_error():
+    text = json.dumps({"jsonrpc": "2.0", "error": {"code": -32602, "message": "no"}, "id": 1})
+    with pytest.raises(Exception, match="no"):
+        list(iter_json_array(_chunks(text, 5)))
+
+
+def test_iter_json_array_truncated():
+    with pytest.raises(ValueError):
+        list(iter_json_array(_chunks('{"result": [{"id": 1}, {"id"', 5)))
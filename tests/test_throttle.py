@@ -0,0 +1,37 @@
+"""Tests for ``idoit.throttle``."""
+
+from idoit.throttle import AdaptiveConcurrencyLimiter, TokenBucket
+
+
+def test_token_bucket(clock):
+    bucket = TokenBucket(10, burst=5, clock=clock, sleep=clock.sleep)
+    for _ in range(5):  # burst
+        bucket.acquire()
+    assert clock.now == 0
+    for _ in range(10):
+        bucket.acquire()
+    assert abs(clock.now - 1.0) < 1e-9
+
+
+def test_adaptive_concurrency_limiter(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4, max_limit=8, clock=clock)
+    for _ in range(4):
+        limiter.acquire()
+    assert limiter.in_flight == 4
+    for _ in range(4):
+        limiter.release(0.1)
+    assert 4.9 < limiter.limit < 5.0  # about one more per round trip
+    for _ in range(200):
+        limiter.acquire()
+        limiter.release(0.1)
+    assert limiter.limit == 8
+    limiter.acquire()
+    limiter.release(0.1, ok=False)
+    assert limiter.limit == 4
+    limiter.acquire()
+    limiter.release(5.0)  # slow, but within the same congestion window
+    assert limiter.limit >= 4
+    clock.now += 10
+    limiter.acquire()
+    limiter.release(5.0)
+    assert limiter.limit == 2